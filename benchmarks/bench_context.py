@@ -0,0 +1,47 @@
+"""Compare flattening a Django Context on every render against reading
+through its layers with ``jingo.LayeredContext``."""
+
+from __future__ import print_function
+
+from utils import allocated, bench, report, setup_django
+
+setup_django()
+
+from django.template import Context  # noqa
+import jinja2  # noqa
+
+import jingo  # noqa
+
+SOURCE = '{% for i in range(10) %}{{ key_0_0 }}{{ key_1_9 }}{% endfor %}'
+
+
+def make_context(layers=10, keys=100):
+    context = Context()
+    for i in range(layers):
+        context.update(dict(('key_%d_%d' % (i, j), j) for j in range(keys)))
+    return context
+
+
+def flatten_render(template, context):
+    """How ``jingo.Template.render`` used to do it."""
+    flat = {}
+    for d in context.dicts:
+        flat.update(d)
+    return jinja2.Template.render(template, flat)
+
+
+def main():
+    template = jingo.get_env().from_string(SOURCE)
+    for layers, keys in ((2, 10), (10, 100), (20, 500)):
+        context = make_context(layers, keys)
+        cases = (
+            ('flatten', lambda: flatten_render(template, context)),
+            ('layered', lambda: template.render(context)),
+        )
+        for name, func in cases:
+            report('%s %dx%d' % (name, layers, keys), bench(func, 200),
+                   allocated(func))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+"""Compare rendering a 40-field form through a Jinja template with and
+without ``jingo.monkey.patch(cache=True)``."""
+
+from __future__ import print_function
+
+from utils import bench, report, setup_django
+
+setup_django()
+
+from django import forms  # noqa
+
+import jingo  # noqa
+import jingo.monkey  # noqa
+
+FIELDS = 40
+
+# Each field is output twice, as pages with a summary or a second layout do.
+SOURCE = """
+<ul class="errors">
+{% for field in form %}{{ field.errors }}{% endfor %}
+</ul>
+{% for field in form %}<p>{{ field.label_tag() }} {{ field }}</p>{% endfor %}
+<div class="mobile">
+{% for field in form %}{{ field }}{% endfor %}
+</div>
+"""
+
+
+def make_form_class():
+    fields = {}
+    for i in range(FIELDS):
+        if i % 3 == 0:
+            fields['choice_%d' % i] = forms.ChoiceField(
+                choices=[(c, 'Choice %d' % c) for c in range(10)])
+        else:
+            fields['text_%d' % i] = forms.CharField(max_length=20)
+    return type(str('BigForm'), (forms.Form,), fields)
+
+
+def main():
+    BigForm = make_form_class()
+    data = dict(('text_%d' % i, 'value %d' % i) for i in range(FIELDS))
+    template = jingo.get_env().from_string(SOURCE)
+
+    def fresh():
+        template.render({'form': BigForm(data)})
+
+    form = BigForm(data)
+
+    def again():
+        template.render({'form': form})
+
+    report('uncached new form', bench(fresh, 20))
+    report('uncached same form', bench(again, 20))
+    jingo.monkey.patch(cache=True)
+    report('cached new form', bench(fresh, 20))
+    report('cached same form', bench(again, 20))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,137 @@
+"""Measure how much memory each forked worker holds on its own, with and
+without ``jingo.prefork()`` in the master process.
+
+Generates a few hundred templates, then for each mode starts a fresh
+"master" process that forks workers the way gunicorn does with
+``preload_app``.  Each worker loads every template, runs a garbage
+collection like a long-lived worker eventually would, and reports its
+unique set size (private memory, from /proc).  Linux only.
+
+    $ python benchmarks/bench_prefork.py [--templates=300] [--workers=4]
+"""
+
+from __future__ import division, print_function
+
+import argparse
+import gc
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from utils import setup_django
+
+TEMPLATE = """
+{%% extends "base.html" %%}
+{%% macro row(item, n) %%}
+  <tr class="{{ loop_class }}"><td>{{ n }}</td><td>{{ item.name|e }}</td>
+  <td>{{ item.price|default(0) }}</td>
+  <td>{{ "{0} of {1}"|f(n, total) }}</td></tr>
+{%% endmacro %%}
+{%% block content %%}
+  <h1>Page %(n)d: {{ title }}</h1>
+  {%% for item in items %%}
+    {%% if item.visible %%}{{ row(item, loop.index) }}{%% endif %%}
+    {%% if loop.index is divisibleby 10 %%}
+      <tr><td>{{ _("Subtotal") }}</td>
+      <td>{{ items[:loop.index]|sum(attribute="price") }}</td></tr>
+    {%% endif %%}
+  {%% else %%}<p>{{ _("Nothing here.") }}</p>
+  {%% endfor %%}
+  {%% include "footer.html" %%}
+{%% endblock %%}
+"""
+
+
+def uss():
+    """This process's private memory, in bytes."""
+    total = 0
+    with open('/proc/self/smaps') as fp:
+        for line in fp:
+            if line.startswith(('Private_Clean:', 'Private_Dirty:')):
+                total += int(line.split()[1]) * 1024
+    return total
+
+
+def make_templates(directory, count):
+    with open(os.path.join(directory, 'base.html'), 'w') as fp:
+        fp.write('<html><body>{% block content %}{% endblock %}</body></html>')
+    with open(os.path.join(directory, 'footer.html'), 'w') as fp:
+        fp.write('<footer>{{ _("Thanks") }}</footer>')
+    for n in range(count):
+        with open(os.path.join(directory, 'page%d.html' % n), 'w') as fp:
+            fp.write(TEMPLATE % {'n': n})
+
+
+def master(directory, workers, use_hook):
+    """Act as the server's master: set up, fork, and collect each worker's
+    private memory and time to load the templates."""
+    setup_django()
+    from django.conf import settings
+    settings.TEMPLATE_DIRS = [directory]
+    settings.JINGO_TEMPLATE_CACHE_SIZE = -1
+    import jingo
+
+    names = sorted(os.listdir(directory))
+    jingo.get_env()
+    if use_hook:
+        jingo.prefork(names)
+
+    results = []
+    for _ in range(workers):
+        read, write = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(read)
+            start = time.time()
+            env = jingo.get_env()
+            for name in names:
+                env.get_template(name)
+            elapsed = time.time() - start
+            gc.collect()
+            os.write(write, ('%d %f' % (uss(), elapsed)).encode())
+            os._exit(0)
+        os.close(write)
+        with os.fdopen(read) as fp:
+            size, elapsed = fp.read().split()
+        os.waitpid(pid, 0)
+        results.append((int(size), float(elapsed)))
+    print('%d %f' % (sum(r[0] for r in results) / len(results),
+                     sum(r[1] for r in results) / len(results)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--templates', type=int, default=300)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--master', choices=['plain', 'prefork'],
+                        help=argparse.SUPPRESS)
+    parser.add_argument('--directory', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.master:
+        master(args.directory, args.workers, args.master == 'prefork')
+        return
+    if not os.path.exists('/proc/self/smaps'):
+        sys.exit('This needs Linux\'s /proc/<pid>/smaps.')
+
+    directory = tempfile.mkdtemp()
+    try:
+        make_templates(directory, args.templates)
+        print('%d templates, %d workers' % (args.templates, args.workers))
+        for mode in ('plain', 'prefork'):
+            out = subprocess.check_output([
+                sys.executable, __file__, '--master', mode,
+                '--directory', directory, '--workers', str(args.workers)])
+            size, elapsed = out.decode().split()
+            print('%-10s %8.1f MB private per worker, %8.1f ms loading '
+                  'templates' % (mode, int(size) / 2 ** 20,
+                                 float(elapsed) * 1000))
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,39 @@
+"""Compare calling a filter through the wrapper ``Register.filter`` used to
+install against calling the registered function directly."""
+
+from __future__ import print_function
+
+import functools
+
+from utils import bench, report, setup_django
+
+setup_django()
+
+import jingo  # noqa
+
+SOURCE = '{%% for i in items %%}{{ i|%s }}{%% endfor %%}'
+
+
+def upper(s):
+    return s.upper()
+
+
+@functools.wraps(upper)
+def wrapped(*args, **kw):
+    """How ``Register.filter()`` used to install ``upper``."""
+    return upper(*args, **kw)
+
+
+def main():
+    env = jingo.get_env()
+    env.filters['bench_direct'] = upper
+    env.filters['bench_wrapped'] = wrapped
+    items = ['item %d' % i for i in range(10000)]
+    for name in ('bench_wrapped', 'bench_direct'):
+        template = env.from_string(SOURCE % name)
+        report('%s x%d' % (name, len(items)),
+               bench(lambda: template.render({'items': items}), 10))
+
+
+if __name__ == '__main__':
+    main()
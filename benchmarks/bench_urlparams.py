@@ -0,0 +1,64 @@
+"""Compare the ``urlparams`` filter against its old QueryDict round trip."""
+
+from __future__ import print_function
+
+from utils import bench, report, setup_django
+
+setup_django()
+
+from django.http import QueryDict  # noqa
+from django.utils.encoding import smart_str  # noqa
+from django.utils.http import urlencode  # noqa
+try:
+    import urlparse
+except ImportError:
+    import urllib.parse as urlparse
+
+from jingo.ext import urlparams  # noqa
+
+URLS = {
+    'no query': '/search/',
+    'small query': '/search/?q=jingo&page=2',
+    'large query': '/search/?' + '&'.join('f%d=%d' % (i, i)
+                                          for i in range(50)),
+}
+
+
+def old_urlparams(url_, fragment=None, query_dict=None, **query):
+    """``jingo.ext.urlparams`` before the fast path."""
+    url_ = urlparse.urlparse(url_)
+    fragment = fragment if fragment is not None else url_.fragment
+
+    q = url_.query
+    new_query_dict = (QueryDict(smart_str(q), mutable=True) if
+                      q else QueryDict('', mutable=True))
+    if query_dict:
+        for k, l in query_dict.lists():
+            new_query_dict[k] = None  # Replace, don't append.
+            for v in l:
+                new_query_dict.appendlist(k, v)
+
+    for k, v in query.items():
+        # Replace, don't append.
+        if isinstance(v, list):
+            new_query_dict.setlist(k, v)
+        else:
+            new_query_dict[k] = v
+
+    query_string = urlencode([(k, v) for k, l in new_query_dict.lists() for
+                              v in l if v is not None])
+    new = urlparse.ParseResult(url_.scheme, url_.netloc, url_.path,
+                               url_.params, query_string, fragment)
+    return new.geturl()
+
+
+def main():
+    for name, url in sorted(URLS.items()):
+        for func in (old_urlparams, urlparams):
+            assert func(url, page=3) == urlparams(url, page=3)
+            report('%s %s' % (func.__name__, name),
+                   bench(lambda: func(url, page=3), 10000))
+
+
+if __name__ == '__main__':
+    main()
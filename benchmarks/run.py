@@ -0,0 +1,96 @@
+"""Run the benchmark suite, save the results and compare them to a baseline.
+
+    $ python benchmarks/run.py --output before.json
+    ... make changes ...
+    $ python benchmarks/run.py --baseline before.json
+
+With ``--baseline``, the exit status is 1 if any benchmark got slower by
+more than ``--threshold`` (10% by default).
+"""
+
+from __future__ import print_function
+
+import argparse
+import json
+import platform
+import sys
+import time
+
+from utils import bench, setup_django
+
+setup_django()
+
+import django  # noqa
+import jinja2  # noqa
+
+import jingo  # noqa
+from suite import BENCHMARKS  # noqa
+
+
+def run(pattern=None, repeat=5):
+    """Return ``{name: seconds per call}`` for the selected benchmarks."""
+    results = {}
+    for name, number, setup in BENCHMARKS:
+        if pattern and pattern not in name:
+            continue
+        with setup() as func:
+            results[name] = bench(func, number, repeat)
+        print('%-40s %10.2f us' % (name, results[name] * 1e6))
+    return results
+
+
+def compare(results, baseline, threshold):
+    """Print each benchmark against ``baseline`` and return the names of the
+    ones that got slower by more than ``threshold``."""
+    regressions = []
+    print()
+    print('%-40s %10s %10s %8s' % ('benchmark', 'baseline', 'now', 'change'))
+    for name in sorted(results):
+        if name not in baseline:
+            continue
+        before, now = baseline[name], results[name]
+        change = now / before - 1
+        flag = ''
+        if change > threshold:
+            regressions.append(name)
+            flag = '  SLOWER'
+        print('%-40s %10.2f %10.2f %+7.1f%%%s' % (
+            name, before * 1e6, now * 1e6, change * 100, flag))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('-k', dest='pattern',
+                        help='Only run benchmarks whose name contains this.')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='Timing runs per benchmark; the best one counts.')
+    parser.add_argument('--output', help='Save the results to this file.')
+    parser.add_argument('--baseline', help='Compare against saved results.')
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help='Slowdown that counts as a regression.')
+    args = parser.parse_args(argv)
+
+    results = run(args.pattern, args.repeat)
+
+    if args.output:
+        with open(args.output, 'w') as fp:
+            json.dump({
+                'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'jinja2': jinja2.__version__,
+                'jingo': jingo.__version__,
+                'results': results,
+            }, fp, indent=2, sort_keys=True)
+
+    if args.baseline:
+        with open(args.baseline) as fp:
+            baseline = json.load(fp)['results']
+        if compare(results, baseline, args.threshold):
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
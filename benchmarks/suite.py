@@ -0,0 +1,216 @@
+"""The benchmarks ``run.py`` times.
+
+Each benchmark is a generator decorated with ``@benchmark(name, number)``.
+It does its setup, yields the callable to time and cleans up after the
+``yield``.  ``number`` is how many calls make up one timing run.
+"""
+
+from __future__ import unicode_literals
+
+import contextlib
+import datetime
+
+from django.template import TemplateDoesNotExist
+from django.test import RequestFactory
+import jinja2
+
+import jingo
+from jingo import ext
+
+BENCHMARKS = []
+
+
+def benchmark(name, number=1000):
+    def decorator(setup):
+        BENCHMARKS.append((name, number, contextlib.contextmanager(setup)))
+        return setup
+    return decorator
+
+
+SMALL = '<h1>{{ title }}</h1><p>{{ body|nl2br }}</p>'
+
+LARGE = """
+<table>
+{% for row in rows %}
+  <tr class="{{ loop.cycle('odd', 'even') }}">
+    <td>{{ row.id }}</td>
+    <td><a href="{{ row.url|urlparams(page=2) }}">{{ row.name }}</a></td>
+    <td>{{ '{0} of {1}'|f(loop.index, rows|length) }}</td>
+  </tr>
+{% endfor %}
+</table>
+"""
+
+DEPTH = 10
+
+
+def _templates():
+    templates = {'small.html': SMALL, 'large.html': LARGE,
+                 'level0.html': '<html>{% block b0 %}{% endblock %}</html>'}
+    for i in range(1, DEPTH):
+        templates['level%d.html' % i] = (
+            '{%% extends "level%d.html" %%}'
+            '{%% block b%d %%}<div>{{ title }}{%% block b%d %%}'
+            '{%% endblock %%}</div>{%% endblock %%}' % (i - 1, i - 1, i))
+    return templates
+
+
+def _env():
+    """jingo's environment with the benchmark templates in front."""
+    env = jingo.get_env()
+    loader = jinja2.ChoiceLoader([jinja2.DictLoader(_templates()),
+                                  env.loader])
+    return env.overlay(loader=loader)
+
+
+ROWS = [{'id': i, 'name': 'Row <%d>' % i, 'url': '/rows/?sort=name&id=%d' % i}
+        for i in range(1000)]
+
+
+# Loading.
+
+@benchmark('startup get_env', 20)
+def startup():
+    def build():
+        old, jingo._env = jingo._env, None
+        try:
+            jingo.get_env()
+        finally:
+            jingo._env = old
+    yield build
+
+
+@benchmark('get_template cold', 200)
+def get_template_cold():
+    env = _env()
+
+    def load():
+        env.cache.clear()
+        env.get_template('large.html')
+    yield load
+
+
+@benchmark('get_template warm', 10000)
+def get_template_warm():
+    env = _env()
+    yield lambda: env.get_template('large.html')
+
+
+@benchmark('loader load_template', 10000)
+def loader_load_template():
+    loader = jingo.Loader()
+    yield lambda: loader.load_template('jinja_app/test.html')
+
+
+def _missing(loader, name):
+    def load():
+        try:
+            loader.load_template(name)
+        except TemplateDoesNotExist:
+            pass
+    return load
+
+
+@benchmark('loader excluded template', 10000)
+def loader_excluded():
+    yield _missing(jingo.Loader(), 'django_app/test.html')
+
+
+@benchmark('loader missing template', 10000)
+def loader_missing():
+    yield _missing(jingo.Loader(), 'jinja_app/missing.html')
+
+
+# Rendering.
+
+@benchmark('render small', 10000)
+def render_small():
+    template = _env().get_template('small.html')
+    context = {'title': 'Hello', 'body': 'one\ntwo\nthree'}
+    yield lambda: template.render(context)
+
+
+@benchmark('render large', 20)
+def render_large():
+    template = _env().get_template('large.html')
+    yield lambda: template.render({'rows': ROWS})
+
+
+@benchmark('render inherited x%d' % DEPTH, 2000)
+def render_inherited():
+    template = _env().get_template('level%d.html' % (DEPTH - 1))
+    yield lambda: template.render({'title': 'Hello'})
+
+
+def _processor(i):
+    def processor(request):
+        return {'processor_%d' % i: i}
+    return processor
+
+
+@contextlib.contextmanager
+def _processors(count):
+    old = jingo.get_standard_processors
+    processors = [_processor(i) for i in range(count)]
+    jingo.get_standard_processors = lambda: processors
+    try:
+        yield
+    finally:
+        jingo.get_standard_processors = old
+
+
+@benchmark('render_to_string 20 processors', 5000)
+def render_to_string_processors():
+    template = _env().get_template('small.html')
+    request = RequestFactory().get('/')
+    context = {'title': 'Hello', 'body': 'one\ntwo'}
+
+    with _processors(20):
+        yield lambda: jingo.render_to_string(request, template, context)
+
+
+# Filters.
+
+@benchmark('filter f')
+def filter_f():
+    yield lambda: ext.f('{0} arguments and {x} arguments', 'positional',
+                        x='keyword')
+
+
+@benchmark('filter fe')
+def filter_fe():
+    yield lambda: ext.fe('<b>{0}</b> and {x}', '<script>', x='&')
+
+
+@benchmark('filter fe x1000 in a template', 100)
+def filter_fe_loop():
+    template = _env().from_string(
+        '{% for row in rows %}{{ "<b>{0}</b> and {x}"|fe(row, x="&") }}'
+        '{% endfor %}')
+    rows = ['<script>'] * 1000
+    yield lambda: template.render({'rows': rows})
+
+
+@benchmark('filter nl2br')
+def filter_nl2br():
+    text = '\n'.join('line <%d>' % i for i in range(20))
+    yield lambda: ext.nl2br(text)
+
+
+@benchmark('filter urlparams')
+def filter_urlparams():
+    yield lambda: ext.urlparams('/search/?q=jingo&page=2#top', page=3,
+                                sort='name')
+
+
+@benchmark('filter datetime')
+def filter_datetime():
+    t = datetime.datetime(2015, 6, 1, 12, 30)
+    yield lambda: ext.datetime_filter(t)
+
+
+@benchmark('filter datetimes x100', number=100)
+def filter_datetimes():
+    ts = [datetime.datetime(2015, 6, 1, 12, 30) + datetime.timedelta(days=i)
+          for i in range(100)]
+    yield lambda: ext.datetimes_filter(ts)
@@ -0,0 +1,56 @@
+"""Helpers shared by the benchmark scripts.
+
+``run.py`` runs the whole suite (see ``suite.py``).  Each ``bench_*.py``
+script compares one change against the code it replaced, and can be run on
+its own from the repository root::
+
+    $ python benchmarks/bench_context.py
+
+"""
+
+from __future__ import print_function
+
+import os
+import sys
+import timeit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+try:
+    import tracemalloc
+except ImportError:  # Py2
+    tracemalloc = None
+
+
+def setup_django():
+    """Configure Django with the test settings, like ``run_tests.py``."""
+    sys.path.insert(0, ROOT)
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'fake_settings')
+    import django
+    django.setup()
+
+
+def bench(func, number=1000, repeat=5):
+    """Return the best time per call to ``func``, in seconds."""
+    return min(timeit.repeat(func, number=number, repeat=repeat)) / number
+
+
+def allocated(func):
+    """Return the peak bytes allocated during one call to ``func``, or None
+    if tracemalloc isn't available."""
+    if tracemalloc is None:
+        return None
+    func()  # Warm up any caches first.
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def report(name, seconds, size=None):
+    line = '%-40s %10.2f us' % (name, seconds * 1e6)
+    if size is not None:
+        line += ' %10d bytes' % size
+    print(line)
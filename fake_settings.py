@@ -5,6 +5,7 @@ path = lambda *a: os.path.join(ROOT, *a)
 ROOT = os.path.dirname(os.path.abspath(__file__))
 INSTALLED_APPS = (
     'django.contrib.admin.apps.SimpleAdminConfig',
+    'jingo',
     'jingo.tests.jinja_app',
     'jingo.tests.django_app',
 )
@@ -2,14 +2,34 @@
 
 from __future__ import unicode_literals
 
+import fnmatch
 import functools
+import gc
 import logging
 import re
+import sys
+import threading
+from collections import OrderedDict
 
 from django.apps import apps
 from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.http import StreamingHttpResponse
 from django.template.base import Origin, TemplateDoesNotExist
 from django.template.loader import BaseLoader
+from django.utils import six, translation
+
+try:
+    from collections.abc import Mapping
+except ImportError:
+    from collections import Mapping
+
+try:
+    from inspect import iscoroutinefunction
+except ImportError:  # Py2
+    def iscoroutinefunction(f):
+        return False
 
 try:
     from importlib import import_module
@@ -45,6 +65,18 @@ except ImportError:
             return False
 
 import jinja2
+from jinja2.utils import concat
+
+from jingo import metrics
+from jingo.bccache import get_bytecode_cache
+from jingo.cache import TemplateCache
+from jingo.discovery import (LazyHelpers, module_file, read_manifest,
+                             write_manifest)
+from jingo.ext import _cache_key
+from jingo.loaders import IndexedLoader, PrecompiledLoader, _search_roots
+from jingo.meta import readable_names
+from jingo.precompile import compile_all, list_templates, load_compiled
+from jingo.watch import TemplateWatcher
 
 try:
     from django.template.engine import Engine
@@ -58,6 +90,8 @@ except ImportError:
     from django.template.context import get_standard_processors
     has_engine = False
 
+default_app_config = 'jingo.appconfig.JingoConfig'
+
 VERSION = (0, 9, 0)
 __version__ = '.'.join(map(str, VERSION))
 
@@ -68,49 +102,171 @@ EXCLUDE_APPS = (
     'context_processors',
 )
 
+# What prefork() loads by default: files that look like templates, not
+# the images or other files that may share their directories.
+PREFORK_TEMPLATES = (
+    '*.html',
+    '*.htm',
+    '*.jinja',
+    '*.jinja2',
+    '*.txt',
+    '*.xml',
+)
+
 log = logging.getLogger('jingo')
 
 _helpers_loaded = False
+_helpers_loading = False
+_helpers_lock = threading.RLock()
+# How long finding the helpers modules took, and what importing each one
+# took and registered (the latest import of each module), for
+# `manage.py jingo_helpers`.
+_helpers_discovery = None
+_helpers_report = OrderedDict()
+
+_glob_re = re.compile(r'[*?[]')
+
+# The keys Django's own context processors return, by dotted path, for
+# JINGO_LAZY_CONTEXT_PROCESSORS.  JINGO_CONTEXT_PROCESSOR_KEYS adds to it.
+CONTEXT_PROCESSOR_KEYS = {}
+for _module in ('django.template.context_processors',
+                'django.core.context_processors'):
+    CONTEXT_PROCESSOR_KEYS.update({
+        _module + '.csrf': ['csrf_token'],
+        _module + '.debug': ['debug', 'sql_queries'],
+        _module + '.i18n': ['LANGUAGES', 'LANGUAGE_CODE', 'LANGUAGE_BIDI'],
+        _module + '.media': ['MEDIA_URL'],
+        _module + '.request': ['request'],
+        _module + '.static': ['STATIC_URL'],
+        _module + '.tz': ['TIME_ZONE'],
+    })
+CONTEXT_PROCESSOR_KEYS.update({
+    'django.contrib.auth.context_processors.auth': ['user', 'perms'],
+    'django.contrib.messages.context_processors.messages': [
+        'messages', 'DEFAULT_MESSAGE_LEVELS'],
+})
+
+
+class LayeredContext(Mapping):
+    """A read-only view over a stack of dicts, like a Django ``Context``.
+
+    Later dicts in ``dicts`` win, exactly as if they had been flattened into
+    one dict in order, but nothing is copied.  The ``dicts`` attribute lets
+    the debug toolbar inspect it like a ``RequestContext``.
+    """
+
+    def __init__(self, dicts):
+        self.dicts = dicts
+
+    def __getitem__(self, key):
+        for d in reversed(self.dicts):
+            if key in d:
+                return d[key]
+        raise KeyError(key)
+
+    def __contains__(self, key):
+        for d in reversed(self.dicts):
+            if key in d:
+                return True
+        return False
+
+    def __iter__(self):
+        seen = set()
+        for d in reversed(self.dicts):
+            for key in d:
+                if key not in seen:
+                    seen.add(key)
+                    yield key
+
+    def __len__(self):
+        return len(set().union(*self.dicts))
+
+    def __bool__(self):
+        return any(self.dicts)
+    __nonzero__ = __bool__
+
+    def copy(self):
+        # Jinja copies the context when it builds a template traceback.
+        return dict(self)
 
 
 class Template(jinja2.Template):
 
+    @classmethod
+    def _from_namespace(cls, environment, namespace, globals):
+        t = super(Template, cls)._from_namespace(environment, namespace,
+                                                 globals)
+        # Async render functions are timed by neither the wrapper nor its
+        # thread-local stack, so they're left alone.
+        if metrics.enabled() and not environment.is_async:
+            # Includes, extends and imports call root_render_func directly,
+            # so wrapping it here times those too.
+            t.root_render_func = metrics.instrument(
+                t.name or '<string>', t.root_render_func)
+        return t
+
     def render(self, context={}):
         """Render's a template, context can be a Django Context or a
         dictionary.
         """
-        # flatten the Django Context into a single dictionary.
-        context_dict = {}
-        if hasattr(context, 'dicts'):
-            for d in context.dicts:
-                context_dict.update(d)
+        try:
+            return concat(self.root_render_func(self._new_context(context)))
+        except Exception:
+            exc_info = sys.exc_info()
+        return self.environment.handle_exception(exc_info, True)
+
+    def generate(self, context={}):
+        """Like :meth:`render`, but yield the output piece by piece instead
+        of building the whole string in memory."""
+        try:
+            for piece in self.root_render_func(self._new_context(context)):
+                yield piece
+        except Exception:
+            exc_info = sys.exc_info()
         else:
-            context_dict = context
+            return
+        yield self.environment.handle_exception(exc_info, True)
 
-            # Django Debug Toolbar needs a RequestContext-like object in order
-            # to inspect context.
-            class FakeRequestContext:
-                dicts = [context]
-            context = FakeRequestContext()
+    def _new_context(self, context):
+        # Django Debug Toolbar needs a RequestContext-like object in order
+        # to inspect context.
+        if not hasattr(context, 'dicts'):
+            context = LayeredContext([context])
 
         # Used by debug_toolbar.
         if settings.TEMPLATE_DEBUG:
             from django.test import signals
-            self.origin = Origin(self.filename)
+            if getattr(self, 'origin', None) is None:
+                self.origin = Origin(self.filename)
             signals.template_rendered.send(sender=self, template=self,
                                            context=context)
 
-        return super(Template, self).render(context_dict)
+        # Read through the context's layers (with our globals underneath)
+        # instead of flattening them into a new dict on every render.
+        vars = LayeredContext([self.globals] + list(context.dicts))
+        return self.new_context(vars, shared=True)
 
 
 class Environment(jinja2.Environment):
     template_class = Template
+    # The TemplateWatcher reloading templates, with JINGO_WATCH_TEMPLATES.
+    watcher = None
 
     def get_template(self, name, parent=None, globals=None):
         """Make sure our helpers get loaded before any templates."""
         load_helpers()
+        if self.watcher is not None:
+            # parent extends, includes or imports name.
+            self.watcher.depends(name, parent)
         return super(Environment, self).get_template(name, parent, globals)
 
+    def select_template(self, names, parent=None, globals=None):
+        if self.watcher is not None:
+            for name in names:
+                self.watcher.depends(name, parent)
+        return super(Environment, self).select_template(names, parent,
+                                                        globals)
+
     def from_string(self, source, globals=None, template_class=None):
         load_helpers()
         return super(Environment, self).from_string(source, globals,
@@ -118,6 +274,16 @@ class Environment(jinja2.Environment):
 
 
 _env = None
+_env_lock = threading.RLock()
+
+
+def _get_loader(loaders, auto_reload=None):
+    """Wrap ``loaders`` in a loader that tries them in order."""
+    if auto_reload is None:
+        auto_reload = settings.DEBUG
+    if getattr(settings, 'JINGO_INDEX_TEMPLATES', False):
+        return IndexedLoader(loaders, auto_reload=auto_reload)
+    return jinja2.ChoiceLoader(loaders)
 
 
 def get_env():
@@ -125,17 +291,37 @@ def get_env():
     global _env
     if _env:
         return _env
+    # Make sure concurrent first requests share one Environment instead of
+    # registering helpers into one that gets thrown away.
+    with _env_lock:
+        if _env is None:
+            _env = _build_env()
+    return _env
+
+
+def _build_env():
     # Mimic Django's setup by loading templates from directories in
     # TEMPLATE_DIRS and packages in INSTALLED_APPS.
     loaders = [jinja2.FileSystemLoader(d) for d in settings.TEMPLATE_DIRS]
     loaders += [jinja2.PackageLoader(c.name) for c in apps.get_app_configs()]
-
+    # Templates compiled by `manage.py jingo_compile` skip the lexer and
+    # parser entirely, so they go first.
+    precompiled = getattr(settings, 'JINGO_PRECOMPILED_TEMPLATES', None)
+    if precompiled:
+        loaders.insert(0, PrecompiledLoader(precompiled))
+
+    # A watcher thread evicts changed templates instead of every load
+    # checking its file.
+    watch = settings.DEBUG and getattr(settings, 'JINGO_WATCH_TEMPLATES',
+                                       False)
     opts = {
         'trim_blocks': True,
         'extensions': ['jinja2.ext.i18n', 'jingo.ext.JingoExtension'],
         'autoescape': True,
-        'auto_reload': settings.DEBUG,
-        'loader': jinja2.ChoiceLoader(loaders),
+        'auto_reload': settings.DEBUG and not watch,
+        'loader': _get_loader(loaders, auto_reload=settings.DEBUG and
+                              not watch),
+        'bytecode_cache': get_bytecode_cache(),
     }
 
     if hasattr(settings, 'JINJA_CONFIG'):
@@ -144,48 +330,300 @@ def get_env():
         else:
             config = settings.JINJA_CONFIG
         opts.update(config)
+    if (getattr(settings, 'JINGO_MINIFY_HTML', False) and
+            'jingo.minify.MinifyExtension' not in opts['extensions']):
+        opts['extensions'] = (list(opts['extensions']) +
+                              ['jingo.minify.MinifyExtension'])
 
     e = Environment(**opts)
+    cache_size = getattr(settings, 'JINGO_TEMPLATE_CACHE_SIZE',
+                         opts.get('cache_size', 400))
+    if cache_size:
+        e.cache = TemplateCache(
+            cache_size, getattr(settings, 'JINGO_PINNED_TEMPLATES', ()))
+    else:
+        e.cache = None
+    if getattr(settings, 'JINGO_LAZY_HELPERS', False):
+        # Only filters: Jinja copies globals with plain dict operations, for
+        # imports and includes, which wouldn't see the names still pending.
+        e.filters = LazyHelpers(e.filters, _import_helpers)
     # Install null translations since gettext isn't always loaded up during
     # testing.
     if ('jinja2.ext.i18n' in e.extensions or
             'jinja2.ext.InternationalizationExtension' in e.extensions):
         e.install_null_translations()
-    _env = e
+    if watch:
+        roots = []
+        for loader in loaders:
+            roots.extend(_search_roots(loader) or ())
+        watcher = TemplateWatcher(
+            roots, backend='auto' if watch is True else watch,
+            interval=getattr(settings, 'JINGO_WATCH_INTERVAL', 1))
+        watcher.watch(e)
+        watcher.start()
     return e
 
 
+def _get_context(request, context, template=None):
+    # Context processors win over the caller's context, like they would if
+    # we merged them into a copy of it, but nothing gets copied.
+    dicts = [{} if context is None else context]
+    for processor in _context_processors(template):
+        dicts.append(processor(request))
+    return LayeredContext(dicts)
+
+
+def _context_processors(template):
+    """Return the context processors to run for ``template``."""
+    lazy = (template is not None and
+            getattr(settings, 'JINGO_LAZY_CONTEXT_PROCESSORS', False))
+    names = readable_names(template) if lazy else None
+    if names is None:
+        return get_standard_processors()
+
+    declared = dict(CONTEXT_PROCESSOR_KEYS)
+    declared.update(getattr(settings, 'JINGO_CONTEXT_PROCESSOR_KEYS', {}))
+    # Only a processor whose keys are declared can be skipped; what it
+    # returned before doesn't say what it'll return next time.
+    # Processors without a name to declare, like partials, always run.
+    processors = []
+    for p in get_standard_processors():
+        keys = declared.get(_processor_path(p))
+        if keys is None or not names.isdisjoint(keys):
+            processors.append(p)
+    return processors
+
+
+def _processor_path(processor):
+    name = getattr(processor, '__name__', None)
+    if name is None:
+        return None
+    return '%s.%s' % (getattr(processor, '__module__', None), name)
+
+
+def _get_template(template):
+    # If it's not a Template, it must be a path to be loaded.
+    if not isinstance(template, jinja2.environment.Template):
+        template = get_env().get_template(template)
+    return template
+
+
 def render_to_string(request, template, context=None):
     """
     Render a template into a string.
     """
-    def get_context():
-        c = {} if context is None else context.copy()
-        for processor in get_standard_processors():
-            c.update(processor(request))
-        return c
+    template = _get_template(template)
+    return template.render(_get_context(request, context, template))
 
-    # If it's not a Template, it must be a path to be loaded.
-    if not isinstance(template, jinja2.environment.Template):
-        template = get_env().get_template(template)
 
-    return template.render(get_context())
+def _buffer(pieces, size):
+    """Join ``pieces`` into chunks of at least ``size`` characters."""
+    buf, buffered = [], 0
+    for piece in pieces:
+        buf.append(piece)
+        buffered += len(piece)
+        if buffered >= size:
+            yield concat(buf)
+            buf, buffered = [], 0
+    if buf:
+        yield concat(buf)
+
+
+def render_to_streaming_response(request, template, context=None,
+                                 chunk_size=None, **kwargs):
+    """
+    Render a template into a ``StreamingHttpResponse``, sending the output
+    as it's generated in chunks of about ``chunk_size`` characters
+    (``JINGO_STREAM_CHUNK_SIZE``, 8192 by default).  Other keyword arguments
+    are passed to the response.
+    """
+    if chunk_size is None:
+        chunk_size = getattr(settings, 'JINGO_STREAM_CHUNK_SIZE', 8192)
+    template = _get_template(template)
+    pieces = template.generate(_get_context(request, context, template))
+    return StreamingHttpResponse(_buffer(pieces, chunk_size), **kwargs)
 
 
 def load_helpers():
     """Try to import ``helpers.py`` from each app in INSTALLED_APPS."""
     # We want to wait as long as possible to load helpers so there aren't any
     # weird circular imports with jingo.
-    global _helpers_loaded
+    global _helpers_loaded, _helpers_loading
     if _helpers_loaded:
         return
-    _helpers_loaded = True
-
-    for config in apps.get_app_configs():
-        if not has_helpers(config):
-            continue
+    # Other threads wait here until every helper is registered.  The lock is
+    # reentrant so a helpers module that loads templates while it's being
+    # imported gets straight through.
+    with _helpers_lock:
+        if _helpers_loaded or _helpers_loading:
+            return
+        _helpers_loading = True
+        try:
+            _load_helpers()
+        finally:
+            _helpers_loading = False
+            _helpers_loaded = True
+
+
+def _load_helpers():
+    global _helpers_discovery
+    start = metrics.timer()
+    app_names = [config.name for config in apps.get_app_configs()]
+    path = getattr(settings, 'JINGO_HELPERS_MANIFEST', None)
+    manifest = read_manifest(path, app_names) if path else None
+    if manifest is None:
+        modules = ['%s.helpers' % config.name
+                   for config in apps.get_app_configs() if has_helpers(config)]
+    else:
+        modules = [entry['module'] for entry in manifest]
+    _helpers_discovery = metrics.timer() - start
+
+    env = get_env()
+    if manifest is not None and isinstance(env.filters, LazyHelpers):
+        # Leave the imports until a template needs one of their filters.
+        # Modules that register functions are imported now.
+        for entry in manifest:
+            if entry['globals']:
+                _import_helpers(entry['module'])
+            else:
+                for name in entry['filters']:
+                    env.filters.pending[name] = entry['module']
+        return
 
-        import_module('%s.helpers' % config.name)
+    for module in modules:
+        _import_helpers(module)
+    if path and manifest is None:
+        write_manifest(path, app_names, _helpers_manifest(modules),
+                       _app_paths())
+
+
+def _app_paths():
+    return [config.path for config in apps.get_app_configs()]
+
+
+def _helpers_manifest(modules):
+    """Return the latest report for each of ``modules`` that's been
+    imported, in order."""
+    return [_helpers_report[m] for m in modules if m in _helpers_report]
+
+
+def _import_helpers(module):
+    """Import a helpers module, recording what it cost and registered."""
+    with _helpers_lock:
+        env = get_env()
+        if isinstance(env.filters, LazyHelpers):
+            env.filters.pending = dict((k, m) for k, m in
+                                       env.filters.pending.items()
+                                       if m != module)
+        imported = module in sys.modules
+        filters, globals_ = dict(env.filters), dict(env.globals)
+        start = metrics.timer()
+        imported_module = import_module(module)
+        _helpers_report.pop(module, None)
+        _helpers_report[module] = {
+            'module': module,
+            'file': module_file(imported_module),
+            'seconds': metrics.timer() - start,
+            'filters': _registered(env.filters, filters, module, imported),
+            'globals': _registered(env.globals, globals_, module, imported),
+        }
+
+
+def _registered(helpers, before, module, imported):
+    if imported:
+        # It registered its helpers before we got here, so go by where they
+        # were defined instead.
+        return sorted(k for k, v in helpers.items()
+                      if getattr(v, '__module__', None) == module)
+    return sorted(k for k, v in helpers.items() if before.get(k) is not v)
+
+
+def warmup(templates=None, workers=None):
+    """Build the Environment, import every app's helpers and load
+    ``templates`` so the first requests don't have to.
+
+    ``templates`` is a list of template names or glob patterns and defaults
+    to ``JINGO_WARMUP_TEMPLATES``.  With more than one ``workers``
+    (``JINGO_COMPILE_WORKERS``, 0 for one per CPU), templates are compiled
+    in that many processes.  Templates that fail to load are logged and
+    skipped.  Returns the names of the templates loaded.
+    """
+    env = get_env()
+    load_helpers()
+    if templates is None:
+        templates = getattr(settings, 'JINGO_WARMUP_TEMPLATES', ())
+    if workers is None:
+        workers = getattr(settings, 'JINGO_COMPILE_WORKERS', 1)
+
+    names, patterns = [], []
+    for t in templates:
+        (patterns if _glob_re.search(t) else names).append(t)
+    if patterns:
+        names.extend(n for n in list_templates(env.loader)
+                     if any(fnmatch.fnmatchcase(n, p) for p in patterns))
+
+    valid = Loader()._valid_template
+    seen = set()
+    names = [n for n in names
+             if n not in seen and valid(n) and not seen.add(n)]
+    if workers == 1:
+        loaded = []
+        for name in names:
+            # Not only syntax errors: a glob can match a file that isn't a
+            # template, or isn't text at all.
+            try:
+                env.get_template(name)
+            except Exception as e:
+                log.warning('Could not warm up %s: %s', name, e)
+            else:
+                loaded.append(name)
+        return loaded
+
+    codes, errors = compile_all(env, names, workers)
+    for name, e in errors:
+        log.warning('Could not warm up %s: %s', name, e)
+    loaded = []
+    for name, code in codes:
+        try:
+            load_compiled(env, name, code)
+        except Exception as e:
+            log.warning('Could not warm up %s: %s', name, e)
+        else:
+            loaded.append(name)
+    return loaded
+
+
+def prefork(templates=None, workers=None):
+    """Warm up a preforking server's master process so its workers share
+    the helpers and compiled templates instead of each loading their own.
+
+    Loads ``templates`` like ``warmup()``, defaulting to
+    ``JINGO_WARMUP_TEMPLATES`` or else every template whose name matches
+    ``PREFORK_TEMPLATES``, and helpers modules
+    that ``JINGO_LAZY_HELPERS`` would have left for later.  Then everything
+    is moved out of the garbage collector's sight with ``gc.freeze()``
+    (Python 3.7 and up), so collections in the workers don't write to, and
+    copy, the pages the master filled.  Returns the names of the templates
+    loaded.
+    """
+    env = get_env()
+    if templates is None:
+        templates = (getattr(settings, 'JINGO_WARMUP_TEMPLATES', None) or
+                     PREFORK_TEMPLATES)
+    evictions = getattr(env.cache, 'evictions', 0)
+    loaded = warmup(templates, workers)
+    if isinstance(env.filters, LazyHelpers):
+        for module in sorted(set(env.filters.pending.values())):
+            _import_helpers(module)
+    if getattr(env.cache, 'evictions', 0) > evictions:
+        log.warning('The template cache is too small for the %d templates '
+                    'loaded before forking; raise '
+                    'JINGO_TEMPLATE_CACHE_SIZE.', len(loaded))
+
+    gc.collect()
+    if hasattr(gc, 'freeze'):
+        gc.freeze()
+    return loaded
 
 
 class Register(object):
@@ -193,42 +631,111 @@ class Register(object):
     def filter(self, f=None, override=True):
         """Adds the decorated function to Jinja's filter library."""
         def decorator(f):
-            @functools.wraps(f)
-            def wrapper(*args, **kw):
-                return f(*args, **kw)
-            return self.filter(wrapper, override)
+            return self.filter(f, override)
 
         if not f:
             return decorator
-        if override or f.__name__ not in get_env().filters:
-            get_env().filters[f.__name__] = f
+        env = get_env()
+        if override or f.__name__ not in env.filters:
+            env.filters[f.__name__] = f
         return f
 
     def function(self, f=None, override=True):
         """Adds the decorated function to Jinja's global namespace."""
         def decorator(f):
-            @functools.wraps(f)
-            def wrapper(*args, **kw):
-                return f(*args, **kw)
-            return self.function(wrapper, override)
+            return self.function(f, override)
 
         if not f:
             return decorator
-        if override or f.__name__ not in get_env().globals:
-            get_env().globals[f.__name__] = f
+        env = get_env()
+        if override or f.__name__ not in env.globals:
+            env.globals[f.__name__] = f
         return f
 
-    def inclusion_tag(self, template):
-        """Adds a function to Jinja, but like Django's @inclusion_tag."""
+    def inclusion_tag(self, template, cache=None, key=None,
+                      timeout=DEFAULT_TIMEOUT, version=None):
+        """Adds a function to Jinja, but like Django's @inclusion_tag.
+
+        The template is only looked up again if ``auto_reload`` finds it
+        changed.  Pass the alias of a Django cache as ``cache`` to cache the
+        rendered output for ``timeout`` seconds, keyed by the text of the
+        context the function returns.  If that text doesn't identify the
+        context, like the default text of objects, or the function is
+        expensive itself, pass a ``key`` function that takes the same
+        arguments as the tag and returns a value or tuple of values instead.
+        ``version`` is passed on to the cache, so changing it invalidates
+        everything cached.
+        """
         def decorator(f):
+            if iscoroutinefunction(f):
+                from jingo.asyncsupport import inclusion_tag
+                return self.function(inclusion_tag(f, template, cache, key,
+                                                   timeout, version))
+
+            loaded = [None, None, None]
+
+            def render(context):
+                t = _tag_template(loaded, get_env(), template)
+                return jinja2.Markup(t.render(context))
+
             @functools.wraps(f)
             def wrapper(*args, **kw):
-                context = f(*args, **kw)
-                t = get_env().get_template(template).render(context)
-                return jinja2.Markup(t)
+                if cache is None:
+                    return render(f(*args, **kw))
+
+                context = None
+                if key is None:
+                    context = f(*args, **kw)
+                    cache_key = _fragment_key(template, context)
+                else:
+                    cache_key = _fragment_key(template, key(*args, **kw),
+                                              from_key=True)
+                html = caches[cache].get(cache_key, version=version)
+                if html is None:
+                    if context is None:
+                        context = f(*args, **kw)
+                    html = render(context)
+                    caches[cache].set(cache_key, six.text_type(html),
+                                      timeout, version=version)
+                return jinja2.Markup(html)
             return self.function(wrapper)
         return decorator
 
+
+def _tag_template(loaded, env, template):
+    """Return an inclusion tag's template from ``env``.
+
+    ``loaded`` holds the Environment, the template and the watcher's
+    generation it was last loaded in, and is only updated when one of those
+    is out of date.
+    """
+    old_env, t, generation = loaded
+    if (old_env is not env or
+            env.auto_reload and not t.is_up_to_date or
+            env.watcher and env.watcher.generation != generation):
+        loaded[:] = (env, env.get_template(template),
+                     env.watcher and env.watcher.generation)
+    return loaded[1]
+
+
+def _fragment_key(template, value, from_key=False):
+    """Return the cache key for an inclusion tag's output.
+
+    ``value`` is the context the tag's function returned or, with
+    ``from_key``, what its ``key`` function returned: a value or a tuple of
+    values.
+    """
+    if not from_key:
+        parts = [p for item in sorted(value.items()) for p in item]
+    elif isinstance(value, (list, tuple)):
+        parts = list(value)
+    else:
+        parts = [value]
+    # Output is translated, so the active language is part of the key.
+    return _cache_key('jingo:inclusion_tag',
+                      [template, translation.get_language()] + parts)
+
+
 register = Register()
 
 
@@ -245,8 +752,21 @@ class Loader(BaseLoader):
             self.include_re = re.compile(include_pattern)
         else:
             self.include_re = None
+        # Template name -> whether it's ours to load.
+        self._valid = {}
+        # Template name -> (source, filename, uptodate) from the Jinja loader.
+        self._sources = {}
+        # The template watcher's generation when _sources was filled.
+        self._generation = None
 
     def _valid_template(self, template_name):
+        try:
+            return self._valid[template_name]
+        except KeyError:
+            valid = self._valid[template_name] = self._check(template_name)
+            return valid
+
+    def _check(self, template_name):
         if self.include_re:
             if not self.include_re.search(template_name):
                 return False
@@ -272,10 +792,19 @@ class Loader(BaseLoader):
         if not self._valid_template(template_name):
             raise TemplateDoesNotExist(template_name)
 
-        try:
-            template = get_env().get_template(template_name)
-        except jinja2.TemplateNotFound:
-            raise TemplateDoesNotExist(template_name)
-
-        with open(template.filename, 'rb') as fp:
-            return (fp.read().decode(settings.FILE_CHARSET), template.filename)
+        # Ask the Jinja loaders for the source rather than compiling the
+        # template and reading its file again, and only ask again if
+        # auto_reload is on and the file changed.
+        env = get_env()
+        if env.watcher and env.watcher.generation != self._generation:
+            self._sources.clear()
+            self._generation = env.watcher.generation
+        cached = self._sources.get(template_name)
+        if cached is None or (env.auto_reload and cached[2] is not None and
+                              not cached[2]()):
+            try:
+                cached = env.loader.get_source(env, template_name)
+            except jinja2.TemplateNotFound:
+                raise TemplateDoesNotExist(template_name)
+            self._sources[template_name] = cached
+        return cached[0], cached[1]
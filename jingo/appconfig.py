@@ -0,0 +1,14 @@
+from django.apps import AppConfig
+from django.conf import settings
+
+
+class JingoConfig(AppConfig):
+    name = 'jingo'
+    verbose_name = 'Jingo'
+
+    def ready(self):
+        # Pay for building the Environment, importing helpers and compiling
+        # templates before the worker starts taking requests.
+        if getattr(settings, 'JINGO_WARMUP', False):
+            from jingo import warmup
+            warmup()
@@ -0,0 +1,189 @@
+"""
+Async rendering, for Python 3.6 and up.
+
+``get_async_env()`` returns an async twin of ``jingo.get_env()``.  It
+shares the loader, bytecode cache, globals, filters and extensions with the
+sync Environment, but compiles templates to coroutines, so helpers and
+context processors can be ``async def`` functions and templates can await
+them::
+
+    from jingo.asyncsupport import render_to_string
+
+    async def view(request):
+        return HttpResponse(await render_to_string(request, 'home.html'))
+
+This module uses syntax Python 2 can't parse, so jingo only imports it when
+it's asked for async rendering.
+"""
+
+from __future__ import unicode_literals
+
+import asyncio
+import functools
+import inspect
+import sys
+import threading
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils import six
+import jinja2
+from jinja2.asyncsupport import concat_async
+
+import jingo
+from jingo.cache import TemplateCache
+
+_async_env = (None, None)  # The sync Environment and its async twin.
+_async_env_lock = threading.Lock()
+
+
+class AsyncTemplate(jingo.Template):
+    """A ``jingo.Template`` compiled for an async Environment."""
+
+    async def render_async(self, context={}):
+        """Like ``render``, but awaits anything the template calls."""
+        try:
+            return await concat_async(
+                self.root_render_func(self._new_context(context)))
+        except Exception:
+            exc_info = sys.exc_info()
+        return self.environment.handle_exception(exc_info, True)
+
+    async def generate_async(self, context={}):
+        """Like ``generate``, but an async generator."""
+        try:
+            async for piece in self.root_render_func(
+                    self._new_context(context)):
+                yield piece
+        except Exception:
+            exc_info = sys.exc_info()
+        else:
+            return
+        yield self.environment.handle_exception(exc_info, True)
+
+    def render(self, context={}):
+        # Like Jinja, run the async render in the event loop for callers
+        # that can't await.
+        loop = asyncio.get_event_loop()
+        return loop.run_until_complete(self.render_async(context))
+
+
+def get_async_env():
+    """Return the async Environment for the current ``jingo.get_env()``."""
+    global _async_env
+    env = jingo.get_env()
+    sync, async_env = _async_env
+    if sync is not env:
+        with _async_env_lock:
+            sync, async_env = _async_env
+            if sync is not env:
+                async_env = _build_async_env(env)
+                _async_env = env, async_env
+    return async_env
+
+
+def _build_async_env(env):
+    # Compiled templates can't be shared, since the same source compiles to
+    # different code, so the async Environment gets its own in-memory cache
+    # of the same size.  Everything else is shared.
+    if env.cache is None:
+        cache_size = 0
+    else:
+        cache_size = getattr(env.cache, 'capacity', -1)
+    async_env = env.overlay(cache_size=cache_size)
+    if isinstance(env.cache, TemplateCache):
+        async_env.cache = TemplateCache(env.cache.capacity, env.cache.pinned)
+    async_env.enable_async = True
+    async_env.is_async = jinja2.environment.have_async_gen
+    async_env.template_class = AsyncTemplate
+    if env.watcher is not None:
+        env.watcher.watch(async_env)
+    return async_env
+
+
+def _get_template(template):
+    if not isinstance(template, jinja2.environment.Template):
+        template = get_async_env().get_template(template)
+    return template
+
+
+async def _get_context(request, context, template=None):
+    """Like ``jingo._get_context``, but awaits processors that return
+    awaitables, concurrently."""
+    processors = jingo._context_processors(template)
+    dicts = [processor(request) for processor in processors]
+    pending = [i for i, d in enumerate(dicts) if inspect.isawaitable(d)]
+    if pending:
+        done = await asyncio.gather(*[dicts[i] for i in pending])
+        for i, d in zip(pending, done):
+            dicts[i] = d
+    return jingo.LayeredContext([{} if context is None else context] + dicts)
+
+
+async def render_to_string(request, template, context=None):
+    """Render a template into a string, like ``jingo.render_to_string``."""
+    template = _get_template(template)
+    context = await _get_context(request, context, template)
+    return await template.render_async(context)
+
+
+async def stream(request, template, context=None, chunk_size=None):
+    """Render a template piece by piece, yielding chunks of at least
+    ``chunk_size`` characters (``JINGO_STREAM_CHUNK_SIZE``, 8192 by
+    default), like ``jingo.render_to_streaming_response``."""
+    if chunk_size is None:
+        chunk_size = getattr(settings, 'JINGO_STREAM_CHUNK_SIZE', 8192)
+    template = _get_template(template)
+    context = await _get_context(request, context, template)
+    buf, buffered = [], 0
+    async for piece in template.generate_async(context):
+        buf.append(piece)
+        buffered += len(piece)
+        if buffered >= chunk_size:
+            yield jinja2.utils.concat(buf)
+            buf, buffered = [], 0
+    if buf:
+        yield jinja2.utils.concat(buf)
+
+
+def inclusion_tag(f, template, cache, key, timeout, version):
+    """The wrapper ``Register.inclusion_tag`` installs for a coroutine
+    function.  It only works in async templates."""
+    loaded = [None, None, None]
+
+    async def render(context):
+        t = jingo._tag_template(loaded, get_async_env(), template)
+        return jinja2.Markup(await t.render_async(context))
+
+    @functools.wraps(f)
+    async def wrapper(*args, **kw):
+        if cache is None:
+            return await render(await f(*args, **kw))
+
+        context = None
+        if key is None:
+            context = await f(*args, **kw)
+            cache_key = jingo._fragment_key(template, context)
+        else:
+            cache_key = jingo._fragment_key(template, key(*args, **kw),
+                                            from_key=True)
+        html = caches[cache].get(cache_key, version=version)
+        if html is None:
+            if context is None:
+                context = await f(*args, **kw)
+            html = await render(context)
+            caches[cache].set(cache_key, six.text_type(html), timeout,
+                              version=version)
+        return jinja2.Markup(html)
+    return wrapper
+
+
+async def cache_fragment(extension, cache, key, now, timeout, caller,
+                         locked):
+    """Finish a ``{% cache %}`` miss in an async template, releasing the
+    regeneration lock if ``locked``."""
+    try:
+        return extension._store(cache, key, now, timeout, await caller())
+    finally:
+        if locked:
+            cache.delete(key + ':lock')
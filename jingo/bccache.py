@@ -0,0 +1,106 @@
+"""
+Persistent bytecode caches for the jingo Environment.
+
+Jinja compiles every template to Python bytecode the first time a process
+loads it.  With a bytecode cache, the compiled code is written somewhere
+shared so the next worker (or the next deploy of the same templates) can skip
+the lexer, parser and compiler entirely.
+
+Pick a backend with ``JINGO_BYTECODE_CACHE`` in ``settings.py``::
+
+    JINGO_BYTECODE_CACHE = {
+        'BACKEND': 'jingo.bccache.FileSystemBytecodeCache',
+        'OPTIONS': {'directory': '/var/cache/jingo'},
+    }
+
+or, to store bytecode in one of your ``CACHES``::
+
+    JINGO_BYTECODE_CACHE = {
+        'BACKEND': 'jingo.bccache.DjangoCacheBytecodeCache',
+        'OPTIONS': {'alias': 'default', 'timeout': None},
+    }
+
+"""
+
+from __future__ import unicode_literals
+
+from hashlib import sha1
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+import jinja2
+from jinja2 import bccache
+
+
+class StatsMixin(object):
+    """Count bytecode cache hits and misses.
+
+    Entries are keyed by the template source checksum and the Jinja version
+    as well as the template name, so editing a template or upgrading Jinja
+    can never load stale bytecode; it just misses.
+    """
+    hits = 0
+    misses = 0
+
+    def get_bucket(self, environment, name, filename, source):
+        checksum = self.get_source_checksum(source)
+        # Async environments, or ones with other extensions, compile the
+        # same source to different code.
+        key = '%s|%s|%s|%s|%s' % (
+            self.get_cache_key(name, filename), checksum, jinja2.__version__,
+            environment.is_async, ','.join(sorted(environment.extensions)))
+        bucket = bccache.Bucket(environment,
+                                sha1(key.encode('utf-8')).hexdigest(),
+                                checksum)
+        self.load_bytecode(bucket)
+        if bucket.code is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return bucket
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses}
+
+    def reset_stats(self):
+        self.hits = self.misses = 0
+
+
+class FileSystemBytecodeCache(StatsMixin, bccache.FileSystemBytecodeCache):
+    """Store bytecode in files in ``directory`` (defaults to a private
+    directory under the system temp dir)."""
+
+
+class DjangoCacheBytecodeCache(StatsMixin, bccache.BytecodeCache):
+    """Store bytecode in the Django cache named by ``alias``."""
+
+    def __init__(self, alias='default', prefix='jingo:bytecode:',
+                 timeout=None):
+        self.alias = alias
+        self.prefix = prefix
+        self.timeout = timeout
+
+    @property
+    def cache(self):
+        from django.core.cache import caches
+        return caches[self.alias]
+
+    def load_bytecode(self, bucket):
+        data = self.cache.get(self.prefix + bucket.key)
+        if data is not None:
+            bucket.bytecode_from_string(data)
+
+    def dump_bytecode(self, bucket):
+        self.cache.set(self.prefix + bucket.key, bucket.bytecode_to_string(),
+                       self.timeout)
+
+
+def get_bytecode_cache():
+    """Build the bytecode cache configured in ``JINGO_BYTECODE_CACHE``, or
+    return None if there isn't one."""
+    config = getattr(settings, 'JINGO_BYTECODE_CACHE', None)
+    if not config:
+        return None
+    backend = import_string(config['BACKEND'])
+    return backend(**config.get('OPTIONS', {}))
@@ -0,0 +1,187 @@
+"""
+The Environment's cache of compiled templates.
+
+``TemplateCache`` replaces Jinja's LRU cache so you can see how it's doing:
+it counts hits, misses and evictions, can estimate the memory each template
+takes, and never evicts templates matching ``JINGO_PINNED_TEMPLATES``.
+``JINGO_TEMPLATE_CACHE_SIZE`` sets how many other templates it holds
+(Jinja's ``cache_size``, 400 by default; -1 for no limit).
+"""
+
+from __future__ import unicode_literals
+
+import collections
+import fnmatch
+import sys
+import threading
+import types
+
+
+class TemplateCache(object):
+    """A least recently used cache of templates, keyed the way Jinja keys
+    them: ``(weakref to the loader, template name)``.
+
+    ``capacity`` bounds the number of templates that aren't pinned, or is
+    negative for no bound.  Templates whose names match one of the ``pinned``
+    names or glob patterns are never evicted and don't count towards it.
+    """
+
+    def __init__(self, capacity=400, pinned=()):
+        self.capacity = capacity
+        self.pinned = tuple(pinned)
+        self.hits = self.misses = self.evictions = 0
+        self._lru = collections.OrderedDict()
+        self._pinned = {}
+        self._lock = threading.Lock()
+
+    def _is_pinned(self, key):
+        name = key[1]
+        return any(fnmatch.fnmatchcase(name, p) for p in self.pinned)
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                value = self._pinned[key]
+            except KeyError:
+                try:
+                    # Move it to the most recently used end.
+                    value = self._lru.pop(key)
+                except KeyError:
+                    self.misses += 1
+                    return default
+                self._lru[key] = value
+            self.hits += 1
+            return value
+
+    def __getitem__(self, key):
+        value = self.get(key, _missing)
+        if value is _missing:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value):
+        with self._lock:
+            if self.pinned and self._is_pinned(key):
+                self._pinned[key] = value
+                return
+            self._lru.pop(key, None)
+            self._lru[key] = value
+            while 0 <= self.capacity < len(self._lru):
+                self._lru.popitem(last=False)
+                self.evictions += 1
+
+    def __delitem__(self, key):
+        with self._lock:
+            if self._pinned.pop(key, _missing) is _missing:
+                del self._lru[key]
+
+    def __contains__(self, key):
+        return key in self._pinned or key in self._lru
+
+    def __len__(self):
+        return len(self._pinned) + len(self._lru)
+
+    def keys(self):
+        with self._lock:
+            return list(self._pinned) + list(self._lru)
+
+    def items(self):
+        with self._lock:
+            return list(self._pinned.items()) + list(self._lru.items())
+
+    def values(self):
+        return [value for _, value in self.items()]
+
+    def clear(self):
+        with self._lock:
+            self._pinned.clear()
+            self._lru.clear()
+
+    def reset_stats(self):
+        self.hits = self.misses = self.evictions = 0
+
+    def stats(self, memory=False):
+        """Return the cache's counters, and with ``memory``, an estimate of
+        the bytes each template takes, largest first."""
+        items = self.items()
+        lookups = self.hits + self.misses
+        stats = {
+            'capacity': self.capacity,
+            'size': len(items),
+            'pinned': len(self._pinned),
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': float(self.hits) / lookups if lookups else None,
+        }
+        if memory:
+            templates = [{'name': key[1], 'bytes': template_size(t),
+                          'pinned': key in self._pinned}
+                         for key, t in items]
+            templates.sort(key=lambda t: t['bytes'], reverse=True)
+            stats['templates'] = templates
+            stats['bytes'] = sum(t['bytes'] for t in templates)
+        return stats
+
+
+_missing = object()
+
+
+def template_size(template):
+    """Estimate the bytes a compiled template holds on to: its code objects
+    and the globals of the module it was compiled into, leaving out anything
+    it shares with other templates, like the Environment."""
+    namespace = _namespace(template)
+    seen = set()
+    size = _size(template, seen) + _size(template.__dict__, seen)
+    if namespace is None:
+        return size
+    size += _size(namespace, seen)
+    for name, value in namespace.items():
+        if name == '__builtins__':
+            continue
+        if isinstance(value, types.FunctionType):
+            if value.__globals__ is namespace:
+                size += _size(value, seen) + _code_size(value.__code__, seen)
+        elif isinstance(value, (dict, tuple, list)):
+            size += _size(value, seen)
+            for item in (value.values() if isinstance(value, dict)
+                         else value):
+                if isinstance(item, types.FunctionType):
+                    size += _code_size(item.__code__, seen)
+                size += _size(item, seen)
+        elif isinstance(value, (bytes, type(''))):
+            size += _size(value, seen)
+    return size
+
+
+def _namespace(template):
+    funcs = list(template.blocks.values())
+    # The metrics wrapper keeps the real render function as __wrapped__.
+    root = template.root_render_func
+    funcs.append(getattr(root, '__wrapped__', root))
+    for func in funcs:
+        namespace = getattr(func, '__globals__', None)
+        if namespace and namespace.get('__jinja_template__') is template:
+            return namespace
+    return None
+
+
+def _size(obj, seen):
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    return sys.getsizeof(obj)
+
+
+def _code_size(code, seen):
+    size = _size(code, seen) + _size(code.co_code, seen)
+    for const in code.co_consts:
+        if isinstance(const, types.CodeType):
+            size += _code_size(const, seen)
+        elif isinstance(const, (bytes, type(''), tuple)):
+            size += _size(const, seen)
+    for names in (code.co_names, code.co_varnames, code.co_freevars,
+                  code.co_cellvars):
+        size += _size(names, seen)
+    return size + _size(code.co_lnotab, seen)
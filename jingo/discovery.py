@@ -0,0 +1,104 @@
+"""
+Remember where template helpers live.
+
+Finding every app's ``helpers`` module means probing each app in
+``INSTALLED_APPS``.  With ``JINGO_HELPERS_MANIFEST`` set, ``load_helpers()``
+writes what it found, and which filters and functions each module
+registered, to that file, and later processes read it instead of probing.
+The manifest also records the modification times of each app's directory
+(which change when a ``helpers`` module is added or removed) and of each
+helpers module, and isn't used once any of them changes.
+
+With ``JINGO_LAZY_HELPERS`` too, the manifest lets a module that only
+registers filters wait to be imported until a template first asks for one.
+"""
+
+from __future__ import unicode_literals
+
+import json
+import logging
+import os
+
+log = logging.getLogger('jingo')
+
+
+class LazyHelpers(dict):
+    """The filters of an Environment, with names that belong to helpers
+    modules nobody has imported yet.
+
+    ``pending`` maps those names to their modules.  Looking one up imports
+    the module with ``load``, which registers the real helper.
+    """
+
+    def __init__(self, helpers, load):
+        super(LazyHelpers, self).__init__(helpers)
+        self.pending = {}
+        self.load = load
+
+    def _load(self, key):
+        module = self.pending.get(key)
+        if module is None:
+            return False
+        self.load(module)
+        return dict.__contains__(self, key)
+
+    def __missing__(self, key):
+        if self._load(key):
+            return self[key]
+        raise KeyError(key)
+
+    def __contains__(self, key):
+        return dict.__contains__(self, key) or self._load(key)
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+
+def read_manifest(path, app_names):
+    """Return the helpers modules listed in the manifest at ``path``, as
+    ``{'module': ..., 'file': ..., 'filters': [...], 'globals': [...]}``
+    dicts in import order, or None if there isn't an up to date manifest for
+    ``app_names``."""
+    try:
+        with open(path) as fp:
+            manifest = json.load(fp)
+    except (EnvironmentError, ValueError):
+        return None
+    if manifest.get('apps') != list(app_names):
+        return None
+    for filename, mtime in manifest.get('mtimes', {}).items():
+        if _mtime(filename) != mtime:
+            return None
+    return manifest['helpers']
+
+
+def write_manifest(path, app_names, helpers, app_paths=()):
+    """Save the ``helpers`` modules found for ``app_names``, whose
+    directories are ``app_paths``, to ``path``."""
+    watched = list(app_paths) + [e['file'] for e in helpers if e.get('file')]
+    mtimes = dict((filename, _mtime(filename)) for filename in watched)
+    try:
+        with open(path + '.tmp', 'w') as fp:
+            json.dump({'apps': list(app_names), 'helpers': helpers,
+                       'mtimes': mtimes}, fp, indent=2, sort_keys=True)
+        os.rename(path + '.tmp', path)
+    except EnvironmentError as e:
+        log.warning('Could not write helpers manifest %s: %s', path, e)
+
+
+def module_file(module):
+    """Return the source file of the imported ``module``, or None."""
+    filename = getattr(module, '__file__', None)
+    if filename and filename.endswith(('.pyc', '.pyo')):
+        filename = filename[:-1]
+    return filename
+
+
+def _mtime(filename):
+    try:
+        return os.path.getmtime(filename)
+    except EnvironmentError:
+        return None
@@ -2,25 +2,83 @@
 
 from __future__ import unicode_literals, print_function
 
+import datetime
+import functools
+import hashlib
+import re
+import time
+from collections import namedtuple
+from string import Formatter
 try:
     import urlparse
+    from urllib import quote_plus
 except ImportError:
     import urllib.parse as urlparse
+    from urllib.parse import quote_plus
 
-from django.core.urlresolvers import reverse
+from django.conf import settings
+from django.core.cache import caches
+try:
+    from django.core.signals import setting_changed
+except ImportError:
+    from django.test.signals import setting_changed
+from django.core.urlresolvers import get_script_prefix, get_urlconf, reverse
+from django.dispatch import receiver
 from django.http import QueryDict
 from django.template.defaulttags import CsrfTokenNode
 from django.utils import six
-from django.utils.encoding import smart_str
+from django.utils.encoding import force_bytes, force_str, force_text, smart_str
+from django.utils.http import urlquote
 try:
     from django.utils.encoding import smart_unicode as smart_text
 except ImportError:
     from django.utils.encoding import smart_text
-from django.utils.http import urlencode
+from django.utils import translation
 from django.utils.translation import ugettext as _
 
 import jinja2
+from jinja2 import Markup, nodes
+from jinja2 import escape as escape_
 from jinja2.ext import Extension
+from jinja2.visitor import NodeTransformer
+
+try:
+    from functools import lru_cache
+except ImportError:  # Py2
+    _CacheInfo = namedtuple('CacheInfo', 'hits misses maxsize currsize')
+
+    def lru_cache(maxsize=128):
+        """Just enough of Python 3's ``functools.lru_cache`` for the helpers
+        below.  Only takes positional arguments, and empties itself when
+        it's full instead of evicting the least recently used entry."""
+        def decorator(func):
+            cache, stats = {}, [0, 0]
+
+            @functools.wraps(func)
+            def wrapper(*args):
+                try:
+                    result = cache[args]
+                except KeyError:
+                    stats[1] += 1
+                    result = func(*args)
+                    if len(cache) >= maxsize:
+                        cache.clear()
+                    cache[args] = result
+                else:
+                    stats[0] += 1
+                return result
+
+            def cache_info():
+                return _CacheInfo(stats[0], stats[1], maxsize, len(cache))
+
+            def cache_clear():
+                cache.clear()
+                stats[:] = [0, 0]
+
+            wrapper.cache_info = cache_info
+            wrapper.cache_clear = cache_clear
+            return wrapper
+        return decorator
 
 
 @jinja2.contextfunction
@@ -57,6 +115,76 @@ def fe(s, *args, **kwargs):
     return jinja2.Markup(s.format(*args, **kwargs))
 
 
+@lru_cache(maxsize=1000)
+def _parse_format(s, escape):
+    """Turn the ``str.format`` string ``s`` into a ``%`` format string and
+    the argument each of its slots takes, for ``f`` or ``fe``.
+
+    Returns None for formats with anything but plain ``{}``, ``{0}`` and
+    ``{name}`` slots, which are left to ``str.format``.
+    """
+    pattern, slots, auto = [], [], None
+    try:
+        parsed = list(Formatter().parse(s))
+    except ValueError:
+        return None
+    for text, field, spec, conversion in parsed:
+        pattern.append(text.replace('%', '%%'))
+        if field is None:
+            continue
+        if spec or conversion:
+            return None
+        # Positional slots count from 1: the format comes first.
+        if field == '':
+            if auto is False:
+                return None
+            auto = True
+            slots.append(len(slots) + 1)
+        elif re.match(r'[0-9]+$', field):
+            if auto:
+                return None
+            auto = False
+            slots.append(int(field) + 1)
+        elif re.match(r'^[^\W\d]\w*$', field, re.UNICODE):
+            slots.append(field)
+        else:
+            return None
+        pattern.append('%s')
+    return ''.join(pattern), tuple(slots), escape
+
+
+def parsed_format(*args, **kwargs):
+    """``f`` or ``fe`` with a format string already parsed by
+    ``_parse_format``, which is passed first."""
+    pattern, slots, escape = args[0]
+    values = [args[slot] if slot.__class__ is int else kwargs[slot]
+              for slot in slots]
+    if escape:
+        # smart_text() leaves text alone, so skip it for the usual case.
+        return Markup(pattern % tuple([
+            escape_(v if isinstance(v, six.text_type) else smart_text(v))
+            for v in values]))
+    return pattern % tuple([format(v, '') for v in values])
+
+
+def _text_format(escape, args, kwargs):
+    spec = _parse_format(six.text_type(args[0]), escape)
+    if spec is None:
+        return (fe if escape else f)(*args, **kwargs)
+    return parsed_format(spec, *args[1:], **kwargs)
+
+
+def f_text(*args, **kwargs):
+    """``f`` for format strings only known at runtime, like translations,
+    that are parsed once per string."""
+    return _text_format(False, args, kwargs)
+
+
+def fe_text(*args, **kwargs):
+    """``fe`` for format strings only known at runtime."""
+    return _text_format(True, args, kwargs)
+
+
 def nl2br(string):
     """Turn newlines into <br>."""
     if not string:
@@ -65,14 +193,110 @@ def nl2br(string):
 
 
 def datetime_filter(t, fmt=None):
-    """Call ``datetime.strftime`` with the given format string."""
+    """Call ``datetime.strftime`` with the given format string.
+
+    The default format is translated once per language, and each format is
+    compiled once into a formatter that gives the same output without
+    going through ``strftime``.
+    """
+    if not t:
+        return ''
+    if fmt is None:
+        fmt = _default_format(translation.get_language())
+    return _formatter(fmt)(t)
+
+
+def datetimes_filter(ts, fmt=None):
+    """Format a list of datetimes like ``datetime``, looking up the format
+    just once."""
     if fmt is None:
-        fmt = _(u'%B %e, %Y')
+        fmt = _default_format(translation.get_language())
+    format_ = _formatter(fmt)
+    return [format_(t) if t else '' for t in ts]
+
+
+@lru_cache(maxsize=100)
+def _default_format(language):
+    return _(u'%B %e, %Y')
+
+
+def _strftime(fmt):
     if not six.PY3:
         # The datetime.strftime function strictly does not
         # support Unicode in Python 2 but is Unicode only in 3.x.
         fmt = fmt.encode('utf-8')
-    return smart_text(t.strftime(fmt)) if t else ''
+    return lambda t: smart_text(t.strftime(fmt))
+
+
+def _names(fmt, dates):
+    # Whatever the C library calls them in this process's locale.
+    return [_strftime(fmt)(d) for d in dates]
+
+
+# What each directive becomes in a %-format string, and how to get its
+# value from a date or datetime.
+_DIRECTIVES = {
+    'Y': ('%d', lambda t: t.year),
+    'y': ('%02d', lambda t: t.year % 100),
+    'm': ('%02d', lambda t: t.month),
+    'd': ('%02d', lambda t: t.day),
+    'e': ('%2d', lambda t: t.day),
+    'j': ('%03d', lambda t: t.toordinal() -
+          datetime.date(t.year, 1, 1).toordinal() + 1),
+    'H': ('%02d', lambda t: getattr(t, 'hour', 0)),
+    'I': ('%02d', lambda t: getattr(t, 'hour', 0) % 12 or 12),
+    'M': ('%02d', lambda t: getattr(t, 'minute', 0)),
+    'S': ('%02d', lambda t: getattr(t, 'second', 0)),
+}
+_NAMES = {
+    'B': ('%B', lambda t: t.month - 1,
+          [datetime.date(2000, m, 1) for m in range(1, 13)]),
+    'b': ('%b', lambda t: t.month - 1,
+          [datetime.date(2000, m, 1) for m in range(1, 13)]),
+    # 2000-01-03 was a Monday, like weekday() 0.
+    'A': ('%A', lambda t: t.weekday(),
+          [datetime.date(2000, 1, d) for d in range(3, 10)]),
+    'a': ('%a', lambda t: t.weekday(),
+          [datetime.date(2000, 1, d) for d in range(3, 10)]),
+    'p': ('%p', lambda t: getattr(t, 'hour', 0) >= 12,
+          [datetime.datetime(2000, 1, 1, h) for h in (0, 12)]),
+}
+_directive_re = re.compile(r'%(.?)')
+
+
+@lru_cache(maxsize=1000)
+def _formatter(fmt):
+    """Return a function formatting a date or datetime like ``strftime``
+    with ``fmt``.  Formats with directives it doesn't know, which depend on
+    the locale or platform, fall back to ``strftime``."""
+    pattern, getters, pos = [], [], 0
+    for match in _directive_re.finditer(fmt):
+        pattern.append(fmt[pos:match.start()].replace('%', '%%'))
+        pos = match.end()
+        code = match.group(1)
+        if code == '%':
+            pattern.append('%%')
+        elif code in _DIRECTIVES:
+            spec, getter = _DIRECTIVES[code]
+            pattern.append(spec)
+            getters.append(getter)
+        elif code in _NAMES:
+            name_fmt, index, dates = _NAMES[code]
+            names = _names(name_fmt, dates)
+            pattern.append('%s')
+            getters.append(lambda t, i=index, n=names: n[i(t)])
+        else:
+            return _strftime(fmt)
+    pattern.append(fmt[pos:].replace('%', '%%'))
+    pattern = ''.join(pattern)
+
+    strftime = _strftime(fmt)
+
+    def format_(t):
+        if not isinstance(t, datetime.date):
+            return strftime(t)
+        return pattern % tuple([g(t) for g in getters])
+    return format_
 
 
 def ifeq(a, b, text):
@@ -99,8 +323,62 @@ def field_attrs(field_inst, **kwargs):
 
 
 def url(viewname, *args, **kwargs):
-    """Return URL using django's ``reverse()`` function."""
-    return reverse(viewname, args=args, kwargs=kwargs)
+    """Return URL using django's ``reverse()`` function.
+
+    Results are memoized per urlconf, script prefix and language, since the
+    same few URLs get reversed over and over.  ``url.cache_info()`` has the
+    hit and miss counts and ``url.cache_clear()`` empties the cache.
+    """
+    # The type goes in the key too, since 1 == True but they reverse
+    # differently.
+    key = (viewname,
+           tuple((type(a), a) for a in args),
+           tuple(sorted((k, type(v), v) for k, v in kwargs.items())),
+           get_urlconf(), get_script_prefix(), translation.get_language())
+    try:
+        return _reverse(key)
+    except TypeError:
+        # Something unhashable; don't cache it.
+        return reverse(viewname, args=args, kwargs=kwargs)
+
+
+@lru_cache(maxsize=1000)
+def _reverse(key):
+    viewname, args, kwargs = key[:3]
+    return reverse(viewname, args=[a for _, a in args],
+                   kwargs=dict((k, v) for k, _, v in kwargs))
+
+
+url.cache_info = _reverse.cache_info
+url.cache_clear = _reverse.cache_clear
+
+
+@receiver(setting_changed)
+def _clear_caches(**kwargs):
+    # Changing ROOT_URLCONF, LANGUAGE_CODE or anything else, in tests.
+    url.cache_clear()
+    _default_format.cache_clear()
+    _formatter.cache_clear()
+
+
+@lru_cache(maxsize=1000)
+def _split_url(url_):
+    """Split ``url_`` into everything before the query, the query as
+    ``(name, encoded)`` pairs and the fragment."""
+    parsed = urlparse.urlparse(url_)
+    # The query and fragment always go on the end, so we can rebuild the
+    # rest once and reuse it.
+    prefix = urlparse.urlunparse(parsed[:4] + ('', ''))
+    query = QueryDict(smart_str(parsed.query))
+    params = tuple((k, _encode_param(k, l)) for k, l in query.lists())
+    return prefix, params, parsed.fragment
+
+
+def _encode_param(name, values):
+    # Same as django.utils.http.urlencode, one name at a time.
+    name = quote_plus(force_str(name))
+    return '&'.join('%s=%s' % (name, quote_plus(force_str(v)))
+                    for v in values if v is not None)
 
 
 def urlparams(url_, fragment=None, query_dict=None, **query):
@@ -110,45 +388,192 @@ Add a fragment and/or query parameters to a URL.
 New query params will be appended to exising parameters, except duplicate
 names, which will be replaced.
 """
-    url_ = urlparse.urlparse(url_)
-    fragment = fragment if fragment is not None else url_.fragment
-
-    q = url_.query
-    new_query_dict = (QueryDict(smart_str(q), mutable=True) if
-                      q else QueryDict('', mutable=True))
-    if query_dict:
-        for k, l in query_dict.lists():
-            new_query_dict[k] = None  # Replace, don't append.
-            for v in l:
-                new_query_dict.appendlist(k, v)
-
-    for k, v in query.items():
-        # Replace, don't append.
-        if isinstance(v, list):
-            new_query_dict.setlist(k, v)
-        else:
-            new_query_dict[k] = v
+    prefix, params, old_fragment = _split_url(url_)
+    if fragment is None:
+        fragment = old_fragment
 
-    query_string = urlencode([(k, v) for k, l in new_query_dict.lists() for
-                              v in l if v is not None])
-    new = urlparse.ParseResult(url_.scheme, url_.netloc, url_.path,
-                               url_.params, query_string, fragment)
-    return new.geturl()
+    if query_dict or query:
+        # Replace, don't append.
+        params = dict(params)
+        if query_dict:
+            for k, l in query_dict.lists():
+                params[k] = _encode_param(k, l)
+        for k, v in query.items():
+            params[k] = _encode_param(k, v if isinstance(v, list) else (v,))
+        params = params.items()
+
+    new = prefix
+    query_string = '&'.join(encoded for k, encoded in params if encoded)
+    if query_string:
+        new += '?' + query_string
+    if fragment:
+        new += '#' + fragment
+    return new
 
 
 class JingoExtension(Extension):
+    """Jingo's helpers, plus a ``{% cache %}`` tag for caching fragments::
+
+        {% cache 'sidebar', user.pk, timeout=600 %}
+            ...
+        {% endcache %}
+
+    Fragments are stored in the ``JINGO_FRAGMENT_CACHE`` Django cache
+    (``'default'`` if unset), keyed by the text of the given values, the
+    template, the tag's line and the active language.  ``timeout``
+    defaults to the cache's own.  An expired fragment is kept as long again,
+    and only one process regenerates it while the others keep serving the
+    stale copy.
+    """
+    tags = set(['cache'])
+
+    # How long a process gets to regenerate an expired fragment before
+    # another one may try.
+    regenerate_timeout = 30
+
     def __init__(self, environment):
+        super(JingoExtension, self).__init__(environment)
         environment.globals.update({
             'csrf': csrf,
             'url': url,
         })
+        if not issubclass(environment.code_generator_class,
+                          FoldFormatsMixin):
+            environment.code_generator_class = type(
+                str('FoldFormatsCodeGenerator'),
+                (FoldFormatsMixin, environment.code_generator_class), {})
         environment.filters.update({
             'class_selected': class_selected,
             'datetime': datetime_filter,
+            'datetimes': datetimes_filter,
             'f': f,
+            'f.parsed': parsed_format,
+            'f.text': f_text,
             'fe': fe,
+            'fe.text': fe_text,
             'field_attrs': field_attrs,
             'ifeq': ifeq,
             'nl2br': nl2br,
             'urlparams': urlparams,
         })
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        vary = [parser.parse_expression()]
+        timeout = nodes.Const(None)
+        while parser.stream.skip_if('comma'):
+            if (parser.stream.current.test('name:timeout') and
+                    parser.stream.look().test('assign')):
+                parser.stream.skip(2)
+                timeout = parser.parse_expression()
+            else:
+                vary.append(parser.parse_expression())
+        body = parser.parse_statements(['name:endcache'], drop_needle=True)
+
+        args = [nodes.Const(parser.name), nodes.Const(lineno),
+                nodes.List(vary), timeout]
+        return nodes.CallBlock(self.call_method('_cache', args), [], [],
+                               body).set_lineno(lineno)
+
+    def _cache(self, name, lineno, vary, timeout, caller):
+        cache = caches[getattr(settings, 'JINGO_FRAGMENT_CACHE', 'default')]
+        key = _cache_key('jingo:cache', [name, lineno,
+                                         translation.get_language()] + vary)
+
+        now = time.time()
+        cached = cache.get(key)
+        # Only regenerating a stale copy takes the lock; a miss just renders.
+        locked = False
+        if cached is not None:
+            expires, html = cached
+            if expires is None or now < expires:
+                return jinja2.Markup(html)
+            # Serve the stale copy if someone else is already regenerating.
+            locked = cache.add(key + ':lock', True, self.regenerate_timeout)
+            if not locked:
+                return jinja2.Markup(html)
+
+        if self.environment.is_async:
+            # The body is a coroutine in async templates.
+            from jingo.asyncsupport import cache_fragment
+            return cache_fragment(self, cache, key, now, timeout, caller,
+                                  locked)
+        try:
+            return self._store(cache, key, now, timeout, caller())
+        finally:
+            # Even if rendering failed, so someone else can try.
+            if locked:
+                cache.delete(key + ':lock')
+
+    def _store(self, cache, key, now, timeout, html):
+        html = six.text_type(html)
+        if timeout is None:
+            timeout = cache.default_timeout
+        if timeout is None:
+            cache.set(key, (None, html), None)
+        else:
+            cache.set(key, (now + timeout, html), timeout * 2)
+        return jinja2.Markup(html)
+
+
+def _cache_key(prefix, parts):
+    """Hash ``parts`` into a cache key starting with ``prefix``.  Like
+    Django's ``{% cache %}`` tag, it goes by each part's text rather than
+    its ``repr``, so pass values like primary keys rather than objects."""
+    text = ':'.join(urlquote(force_text(part)) for part in parts)
+    return '%s:%s' % (prefix, hashlib.md5(force_bytes(text)).hexdigest())
+
+
+class FoldFormats(NodeTransformer):
+    """Parse the format strings of ``f`` and ``fe`` at compile time.
+
+    ``{{ "<em>{0}</em>"|fe(name) }}`` becomes a call to the ``f.parsed``
+    filter with the parsed format in the template code, so rendering
+    doesn't parse it again.  Format strings passed through ``_()`` go to
+    ``f.text`` or ``fe.text`` instead, which parse each translation once.
+    Filters overridden with ``register.filter`` are left alone.
+    """
+
+    names = {'f': f, 'fe': fe}
+    gettext = set(['_', 'gettext', 'ugettext'])
+
+    def __init__(self, environment):
+        self.environment = environment
+
+    def visit_Filter(self, node):
+        node = self.generic_visit(node)
+        func = self.names.get(node.name)
+        if (func is None or self.environment.filters.get(node.name) is
+                not func or node.dyn_args or node.dyn_kwargs):
+            return node
+        if isinstance(node.node, nodes.Const):
+            if (not isinstance(node.node.value, six.string_types) or
+                    all(isinstance(arg, nodes.Const) for arg in
+                        node.args + [kw.value for kw in node.kwargs])):
+                # Not a format string, or Jinja can do it all now.
+                return node
+            spec = _parse_format(six.text_type(node.node.value),
+                                 func is fe)
+            if spec is None:
+                return node
+            node.node = nodes.Const(spec, lineno=node.lineno)
+            node.name = 'f.parsed'
+        elif self._translated(node.node):
+            node.name += '.text'
+        return node
+
+    def _translated(self, node):
+        return (isinstance(node, nodes.Call) and
+                isinstance(node.node, nodes.Name) and
+                node.node.name in self.gettext and
+                len(node.args) == 1 and
+                isinstance(node.args[0], nodes.Const) and
+                not (node.kwargs or node.dyn_args or node.dyn_kwargs))
+
+
+class FoldFormatsMixin(object):
+    """Code generator mixin applying ``FoldFormats`` to every template."""
+
+    def visit_Template(self, node, frame=None):
+        FoldFormats(self.environment).visit(node)
+        return super(FoldFormatsMixin, self).visit_Template(node, frame)
@@ -0,0 +1,161 @@
+"""Jinja loaders used by jingo's Environment."""
+
+from __future__ import unicode_literals
+
+import collections
+import os
+import threading
+import time
+
+import jinja2
+from jinja2.loaders import split_template_path
+from jinja2.utils import internalcode
+
+
+class PrecompiledLoader(jinja2.ModuleLoader):
+    """Load templates compiled ahead of time by ``manage.py jingo_compile``.
+
+    ``path`` is the directory or zip file the command wrote to.  Templates
+    that weren't precompiled fall through to the next loader in the
+    ``ChoiceLoader``.
+    """
+
+    def get_source(self, environment, template):
+        # A ModuleLoader has no source to give, so let the ChoiceLoader ask
+        # the source loaders behind us instead of blowing up.
+        raise jinja2.TemplateNotFound(template)
+
+    @internalcode
+    def load(self, environment, name, globals=None):
+        # The modules hold sync code, which an async Environment can't run.
+        if environment.is_async:
+            raise jinja2.TemplateNotFound(name)
+        return super(PrecompiledLoader, self).load(environment, name, globals)
+
+
+def _mtime(path):
+    try:
+        return os.stat(path).st_mtime
+    except OSError:
+        return None
+
+
+def _search_roots(loader):
+    """Return the directories ``loader`` reads templates from, or None if it
+    doesn't read from the filesystem."""
+    if isinstance(loader, jinja2.FileSystemLoader):
+        return loader.searchpath
+    if isinstance(loader, jinja2.PackageLoader) and loader.filesystem_bound:
+        return [os.path.join(loader.provider.module_path,
+                             loader.package_path)]
+    return None
+
+
+def _walk(roots):
+    """Return the template names under ``roots`` and the mtime of every
+    directory they're in."""
+    names, dirs = set(), {}
+    for root in roots:
+        dirs[root] = _mtime(root)
+        # Follow links like FileSystemLoader.get_source does.
+        for dirpath, _, filenames in os.walk(root, followlinks=True):
+            dirs[dirpath] = _mtime(dirpath)
+            prefix = os.path.relpath(dirpath, root).split(os.sep)
+            if prefix == [os.curdir]:
+                prefix = []
+            names.update('/'.join(prefix + [f]) for f in filenames)
+    return names, dirs
+
+
+_Index = collections.namedtuple('_Index', 'owners unlisted dirs missing')
+
+
+class IndexedLoader(jinja2.BaseLoader):
+    """A ``ChoiceLoader`` that knows which loader has each template.
+
+    Instead of asking every loader in turn, the names of all the templates
+    are indexed up front so a lookup goes straight to the loader that has
+    it, and names nobody has are remembered and fail right away.  Loaders
+    that can't list their templates (like :class:`PrecompiledLoader`) are
+    still asked, in order, ahead of the indexed loader.
+
+    With ``auto_reload``, the index is rebuilt if any template directory
+    changed, checking at most once every ``check_interval`` seconds.
+    """
+
+    def __init__(self, loaders, auto_reload=False, check_interval=1):
+        self.loaders = loaders
+        self.auto_reload = auto_reload
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._index = self._build()
+
+    def _build(self):
+        owners, unlisted, dirs = {}, [], {}
+        for loader in self.loaders:
+            roots = _search_roots(loader)
+            if roots is not None:
+                names, loader_dirs = _walk(roots)
+                dirs.update(loader_dirs)
+            else:
+                try:
+                    names = loader.list_templates()
+                except TypeError:
+                    unlisted.append(loader)
+                    continue
+            for name in names:
+                if name not in owners:
+                    owners[name] = tuple(unlisted) + (loader,)
+        self._checked = time.time()
+        return _Index(owners, tuple(unlisted), dirs, set())
+
+    def refresh(self):
+        """Index the templates again, now."""
+        with self._lock:
+            self._index = self._build()
+
+    def _get_index(self):
+        index = self._index
+        if self.auto_reload and self._changed(index):
+            with self._lock:
+                if self._index is index:
+                    self._index = self._build()
+                index = self._index
+        return index
+
+    def _changed(self, index):
+        now = time.time()
+        if now - self._checked < self.check_interval:
+            return False
+        self._checked = now
+        return any(_mtime(d) != mtime for d, mtime in index.dirs.items())
+
+    def _candidates(self, index, name):
+        key = '/'.join(split_template_path(name))
+        if key in index.missing:
+            return key, ()
+        return key, index.owners.get(key, index.unlisted)
+
+    def get_source(self, environment, template):
+        _, loaders = self._candidates(self._get_index(), template)
+        for loader in loaders:
+            try:
+                return loader.get_source(environment, template)
+            except jinja2.TemplateNotFound:
+                pass
+        raise jinja2.TemplateNotFound(template)
+
+    @internalcode
+    def load(self, environment, name, globals=None):
+        index = self._get_index()
+        key, loaders = self._candidates(index, name)
+        for loader in loaders:
+            try:
+                return loader.load(environment, name, globals)
+            except jinja2.TemplateNotFound:
+                pass
+        index.missing.add(key)
+        raise jinja2.TemplateNotFound(name)
+
+    def list_templates(self):
+        return sorted(self._get_index().owners)
@@ -0,0 +1,43 @@
+from __future__ import unicode_literals
+
+from optparse import make_option
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+import jingo
+from jingo.cache import TemplateCache
+
+
+class Command(BaseCommand):
+    help = ('Load templates into the template cache and report what each '
+            'one costs in memory, with the cache\'s hits, misses and '
+            'evictions.')
+    args = '[template or pattern ...]'
+    option_list = BaseCommand.option_list + (
+        make_option('--limit', type='int', default=20,
+                    help='Number of templates to show, largest first.'),
+    )
+
+    def handle(self, *args, **options):
+        cache = jingo.get_env().cache
+        if not isinstance(cache, TemplateCache):
+            raise CommandError('The template cache is turned off.')
+        # Load what a warmed up worker would have, or everything.
+        templates = (list(args) or
+                     getattr(settings, 'JINGO_WARMUP_TEMPLATES', None) or
+                     ['*'])
+        jingo.warmup(templates)
+
+        stats = cache.stats(memory=True)
+        capacity = stats['capacity']
+        self.stdout.write('%d templates cached (%d pinned), capacity %s.' % (
+            stats['size'], stats['pinned'],
+            'unlimited' if capacity < 0 else capacity))
+        self.stdout.write('%d hits, %d misses, %d evictions.' % (
+            stats['hits'], stats['misses'], stats['evictions']))
+        self.stdout.write('%-60s %10s' % ('template', 'KB'))
+        for t in stats['templates'][:options['limit']]:
+            self.stdout.write('%-60s %10.1f%s' % (
+                t['name'], t['bytes'] / 1024.0, ' (pinned)' * t['pinned']))
+        self.stdout.write('%-60s %10.1f' % ('total', stats['bytes'] / 1024.0))
@@ -0,0 +1,44 @@
+from __future__ import unicode_literals
+
+from optparse import make_option
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from jingo import Loader, get_env
+from jingo.precompile import compile_templates
+
+
+class Command(BaseCommand):
+    help = ('Compile every Jinja template into Python modules for '
+            'JINGO_PRECOMPILED_TEMPLATES.')
+    args = '<target>'
+    option_list = BaseCommand.option_list + (
+        make_option('--zip', choices=['deflated', 'stored'], default=None,
+                    help='Write a zip file (deflated or stored) instead '
+                         'of a directory.'),
+        make_option('--workers', type='int', default=None,
+                    help='Compile in this many processes (0 for one per '
+                         'CPU; defaults to JINGO_COMPILE_WORKERS or 1).'),
+    )
+
+    def handle(self, *args, **options):
+        if len(args) != 1:
+            raise CommandError('Usage: jingo_compile %s' % self.args)
+        target = args[0]
+        workers = options.get('workers')
+        if workers is None:
+            workers = getattr(settings, 'JINGO_COMPILE_WORKERS', 1)
+
+        compiled, errors = compile_templates(
+            get_env(), target, zip=options['zip'],
+            filter_func=Loader()._valid_template, workers=workers)
+
+        for name, e in errors:
+            self.stderr.write('%s: %s' % (name, e))
+        if errors:
+            raise CommandError('%d templates failed to compile.' %
+                               len(errors))
+        if int(options.get('verbosity', 1)) > 0:
+            self.stdout.write('Compiled %d templates into %s.' %
+                              (len(compiled), target))
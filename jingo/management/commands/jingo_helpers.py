@@ -0,0 +1,52 @@
+from __future__ import unicode_literals
+
+from optparse import make_option
+
+from django.apps import apps
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+import jingo
+from jingo.discovery import LazyHelpers, write_manifest
+
+
+class Command(BaseCommand):
+    help = ("Import every app's template helpers and report what each "
+            "module cost to import and registered.")
+    option_list = BaseCommand.option_list + (
+        make_option('--write-manifest', action='store_true', default=False,
+                    help='Save the helpers found to JINGO_HELPERS_MANIFEST.'),
+    )
+
+    def handle(self, *args, **options):
+        path = getattr(settings, 'JINGO_HELPERS_MANIFEST', None)
+        if options['write_manifest'] and not path:
+            raise CommandError('JINGO_HELPERS_MANIFEST is not set.')
+
+        jingo.load_helpers()
+        # Import anything lazy loading has left for later, so it's counted.
+        env = jingo.get_env()
+        if isinstance(env.filters, LazyHelpers):
+            for module in sorted(set(env.filters.pending.values())):
+                jingo._import_helpers(module)
+
+        report = sorted(jingo._helpers_report.values(),
+                        key=lambda e: e['seconds'], reverse=True)
+        self.stdout.write('%-50s %9s %8s %10s' % (
+            'module', 'ms', 'filters', 'functions'))
+        for entry in report:
+            self.stdout.write('%-50s %9.1f %8d %10d' % (
+                entry['module'], entry['seconds'] * 1000,
+                len(entry['filters']), len(entry['globals'])))
+        self.stdout.write('%-50s %9.1f' % (
+            'total', sum(e['seconds'] for e in report) * 1000))
+        if jingo._helpers_discovery is not None:
+            self.stdout.write('Finding helpers modules took %.1f ms.' %
+                              (jingo._helpers_discovery * 1000))
+
+        if options['write_manifest']:
+            app_names = [c.name for c in apps.get_app_configs()]
+            modules = ['%s.helpers' % name for name in app_names]
+            write_manifest(path, app_names, jingo._helpers_manifest(modules),
+                           jingo._app_paths())
+            self.stdout.write('Wrote %s.' % path)
@@ -0,0 +1,55 @@
+from __future__ import unicode_literals
+
+from optparse import make_option
+
+from django.core.management.base import BaseCommand
+
+import jinja2
+
+from jingo import Loader, get_env, minify
+from jingo.precompile import list_templates
+
+
+class Command(BaseCommand):
+    help = ('Report how many bytes of static HTML JINGO_MINIFY_HTML strips '
+            'from each template.')
+    option_list = BaseCommand.option_list + (
+        make_option('--limit', type='int', default=20,
+                    help='Number of templates to show, most bytes saved '
+                         'first.'),
+    )
+
+    def handle(self, *args, **options):
+        env = get_env()
+        if minify.MinifyExtension.identifier not in env.extensions:
+            # Report what turning it on would save.
+            env = env.overlay(extensions=[minify.MinifyExtension])
+
+        valid = Loader()._valid_template
+        names = [n for n in list_templates(env.loader) if valid(n)]
+        for name in names:
+            try:
+                source, filename, _ = env.loader.get_source(env, name)
+                env.parse(source, name, filename)
+            except jinja2.TemplateError as e:
+                self.stderr.write('%s: %s' % (name, e))
+
+        sizes = [(name, minify.saved[name]) for name in names
+                 if name in minify.saved]
+        sizes.sort(key=lambda s: s[1][0] - s[1][1], reverse=True)
+        self.stdout.write('%-50s %10s %10s %10s %6s' % (
+            'template', 'before', 'after', 'saved', '%'))
+        for name, (before, after) in sizes[:options['limit']]:
+            self.stdout.write('%-50s %10d %10d %10d %6s' % (
+                name, before, after, before - after, percent(before, after)))
+        before = sum(s[1][0] for s in sizes)
+        after = sum(s[1][1] for s in sizes)
+        self.stdout.write('%-50s %10d %10d %10d %6s' % (
+            'total (%d templates)' % len(sizes), before, after,
+            before - after, percent(before, after)))
+
+
+def percent(before, after):
+    if not before:
+        return '-'
+    return '%.1f' % (100.0 * (before - after) / before)
@@ -0,0 +1,52 @@
+from __future__ import unicode_literals
+
+from optparse import make_option
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from jingo import metrics
+
+
+class Command(BaseCommand):
+    help = ('Report template render times (in milliseconds) collected with '
+            'JINGO_RENDER_METRICS.')
+    option_list = BaseCommand.option_list + (
+        make_option('--dir', default=None,
+                    help='Directory of metrics files to read (defaults to '
+                         'JINGO_RENDER_METRICS_DIR).'),
+        make_option('--limit', type='int', default=20,
+                    help='Number of templates to show, slowest (by own '
+                         'time) first.'),
+    )
+
+    def handle(self, *args, **options):
+        directory = (options['dir'] or
+                     getattr(settings, 'JINGO_RENDER_METRICS_DIR', None))
+        if directory:
+            stats = metrics.load(directory)
+        else:
+            stats = metrics.aggregator.snapshot()
+        if not stats:
+            self.stdout.write('No renders recorded.')
+            return
+
+        rows = sorted(stats.items(), key=lambda i: i[1]['own'], reverse=True)
+        self.stdout.write('%-40s %7s %9s %9s %8s %8s %8s %8s %10s  %s' % (
+            'template', 'count', 'total', 'own', 'mean', 'p50', 'p95',
+            'p99', 'chars', 'parent'))
+        for name, s in rows[:options['limit']]:
+            samples = s['samples']
+            parents = s['parents']
+            parent = (max(parents, key=parents.get) if parents else '-')
+            self.stdout.write('%-40s %7d %9s %9s %8s %8s %8s %8s %10d  %s' % (
+                name, s['count'], ms(s['total']), ms(s['own']),
+                ms(s['total'] / s['count']),
+                ms(metrics.percentile(samples, 50)),
+                ms(metrics.percentile(samples, 95)),
+                ms(metrics.percentile(samples, 99)),
+                s['size'] // s['count'], parent))
+
+
+def ms(seconds):
+    return '%.1f' % (seconds * 1000)
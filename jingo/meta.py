@@ -0,0 +1,72 @@
+"""
+Work out which context variables a template can read.
+
+``render_to_string`` uses this to skip context processors whose output a
+template never looks at (see ``JINGO_LAZY_CONTEXT_PROCESSORS``).
+"""
+
+from __future__ import unicode_literals
+
+import jinja2
+from jinja2 import meta, nodes
+
+
+def readable_names(template):
+    """Return the set of top-level names ``template``, or any template it
+    extends, includes or imports, can read from its context.
+
+    Returns None if that can't be worked out: the template wasn't loaded by
+    name, references templates dynamically, or calls context functions or
+    filters, which can read anything.  The answer is remembered on the
+    template, so an auto-reloaded template is analysed again, and under
+    ``auto_reload`` it's worked out again when a template it pulls in
+    changes.
+    """
+    env = template.environment
+    cached = getattr(template, '_jingo_readable_names', None)
+    if cached is not None:
+        names, uptodates = cached
+        if not env.auto_reload or all(u() for u in uptodates):
+            return names
+    names, uptodates = None, []
+    if template.name is not None:
+        names = _find_names(env, template.name, set([template.name]),
+                            uptodates)
+    # Jinja reloads the template itself when it changes.
+    template._jingo_readable_names = (
+        names, [u for u in uptodates[1:] if u is not None])
+    return names
+
+
+def _find_names(env, name, seen, uptodates):
+    try:
+        source, _, uptodate = env.loader.get_source(env, name)
+        ast = env.parse(source, name)
+    except jinja2.TemplateError:
+        return None
+    uptodates.append(uptodate)
+
+    names = set(meta.find_undeclared_variables(ast))
+    for n in names:
+        if _reads_context(env.globals.get(n)):
+            return None
+    for node in ast.find_all(nodes.Filter):
+        if _reads_context(env.filters.get(node.name)):
+            return None
+
+    for ref in meta.find_referenced_templates(ast):
+        if ref is None:
+            return None
+        if ref in seen:
+            continue
+        seen.add(ref)
+        ref_names = _find_names(env, ref, seen, uptodates)
+        if ref_names is None:
+            return None
+        names |= ref_names
+    return names
+
+
+def _reads_context(f):
+    return (getattr(f, 'contextfunction', False) or
+            getattr(f, 'contextfilter', False))
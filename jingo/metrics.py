@@ -0,0 +1,184 @@
+"""
+Lightweight render timing.
+
+Set ``JINGO_RENDER_METRICS = True`` and every template jingo loads reports
+each render to the functions in ``listeners``::
+
+    listener(name, elapsed, own, size, parent)
+
+``elapsed`` is the wall time in seconds, ``own`` the part of it not spent
+in templates it included, extended or imported, ``size`` the number of
+characters it produced and ``parent`` the name of the template that pulled
+it in, or None for top-level renders.
+
+``aggregator``, the only listener by default, keeps per-template counts,
+times, sizes and parents in memory.  With ``JINGO_RENDER_METRICS_DIR`` set,
+each process writes its numbers there every minute, and ``manage.py
+jingo_render_stats`` reports on all of them.
+"""
+
+from __future__ import division, unicode_literals
+
+import collections
+import json
+import logging
+import os
+import threading
+import time
+
+from django.conf import settings
+
+log = logging.getLogger('jingo')
+
+timer = getattr(time, 'perf_counter', time.time)
+
+_local = threading.local()
+
+
+class _Frame(object):
+    __slots__ = ('name', 'children', 'size')
+
+    def __init__(self, name):
+        self.name = name
+        self.children = 0.0
+        self.size = 0
+
+
+def instrument(name, render_func):
+    """Wrap a template's ``root_render_func`` to time it."""
+    def root(context):
+        stack = getattr(_local, 'stack', None)
+        if stack is None:
+            stack = _local.stack = []
+        parent = stack[-1] if stack else None
+        frame = _Frame(name)
+        stack.append(frame)
+        start = timer()
+        try:
+            for event in render_func(context):
+                frame.size += len(event)
+                yield event
+        finally:
+            elapsed = timer() - start
+            stack.remove(frame)
+            if parent is not None:
+                parent.children += elapsed
+                parent_name = parent.name
+            else:
+                parent_name = None
+            # Metrics mustn't break the render, or hide its own error.
+            for listener in listeners:
+                try:
+                    listener(name, elapsed, elapsed - frame.children,
+                             frame.size, parent_name)
+                except Exception:
+                    log.exception('Render metrics listener %r failed.',
+                                  listener)
+    root.__wrapped__ = render_func
+    return root
+
+
+class TemplateStats(object):
+    """Render numbers for one template.  Percentiles come from the last
+    ``max_samples`` renders."""
+    max_samples = 1000
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.own = 0.0
+        self.size = 0
+        self.samples = collections.deque(maxlen=self.max_samples)
+        self.parents = collections.Counter()
+
+    def add(self, elapsed, own, size, parent):
+        self.count += 1
+        self.total += elapsed
+        self.own += own
+        self.size += size
+        self.samples.append(elapsed)
+        if parent is not None:
+            self.parents[parent] += 1
+
+    def as_dict(self):
+        return {'count': self.count, 'total': self.total, 'own': self.own,
+                'size': self.size, 'samples': list(self.samples),
+                'parents': dict(self.parents)}
+
+
+class Aggregator(object):
+    """Collect render numbers per template name."""
+    flush_interval = 60
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def __call__(self, name, elapsed, own, size, parent):
+        with self._lock:
+            self.stats[name].add(elapsed, own, size, parent)
+        if timer() - self._flushed > self.flush_interval:
+            self.flush()
+
+    def reset(self):
+        with self._lock:
+            self.stats = collections.defaultdict(TemplateStats)
+            self._flushed = timer()
+
+    def snapshot(self):
+        """Return ``{name: stats dict}`` for every template seen."""
+        with self._lock:
+            return dict((name, s.as_dict()) for name, s in self.stats.items())
+
+    def flush(self):
+        """Write a snapshot to ``JINGO_RENDER_METRICS_DIR``, if it's set.
+        Failures are logged."""
+        self._flushed = timer()
+        directory = getattr(settings, 'JINGO_RENDER_METRICS_DIR', None)
+        if not directory:
+            return
+        path = os.path.join(directory, 'render-%d.json' % os.getpid())
+        try:
+            with open(path + '.tmp', 'w') as fp:
+                json.dump(self.snapshot(), fp)
+            os.rename(path + '.tmp', path)
+        except Exception:
+            log.exception('Could not write render metrics to %s.', path)
+
+
+aggregator = Aggregator()
+listeners = [aggregator]
+
+
+def enabled():
+    return getattr(settings, 'JINGO_RENDER_METRICS', False)
+
+
+def load(directory):
+    """Merge the snapshots every process wrote to ``directory``."""
+    merged = {}
+    for filename in sorted(os.listdir(directory)):
+        if not (filename.startswith('render-') and
+                filename.endswith('.json')):
+            continue
+        with open(os.path.join(directory, filename)) as fp:
+            snapshot = json.load(fp)
+        for name, s in snapshot.items():
+            m = merged.setdefault(name, {'count': 0, 'total': 0.0, 'own': 0.0,
+                                         'size': 0, 'samples': [],
+                                         'parents': {}})
+            for key in ('count', 'total', 'own', 'size'):
+                m[key] += s[key]
+            m['samples'].extend(s['samples'])
+            for parent, n in s['parents'].items():
+                m['parents'][parent] = m['parents'].get(parent, 0) + n
+    return merged
+
+
+def percentile(samples, p):
+    """Return the ``p``th percentile of ``samples`` (nearest rank)."""
+    if not samples:
+        return 0.0
+    samples = sorted(samples)
+    rank = int(round(p / 100 * (len(samples) - 1)))
+    return samples[rank]
@@ -0,0 +1,111 @@
+"""
+Strip indentation and blank lines out of templates when they're compiled.
+
+Add ``jingo.minify.MinifyExtension`` to the Environment's extensions, or set
+``JINGO_MINIFY_HTML = True``, and every run of whitespace in a template's
+static HTML becomes a single newline (if it had one) or space.  Browsers
+collapse whitespace like that anyway, so pages look the same, but they're
+smaller and there's less to concatenate.  Nothing happens at render time.
+
+The contents of ``<pre>``, ``<textarea>``, ``<script>`` and ``<style>``
+elements and of quoted attribute values are left as they are, and so is
+everything Jinja outputs.  Text in ``{% trans %}`` blocks is left alone
+too, since it's the message looked up in the catalog.  Elements styled with
+``white-space: pre`` can't be told apart, so keep the extension off for
+templates that use it.
+
+``jingo.minify.saved`` maps the name of every template compiled since to its
+static HTML's size before and after, in bytes.  ``manage.py jingo_minify``
+compiles them all and reports the savings.
+"""
+
+from __future__ import unicode_literals
+
+import re
+
+from jinja2.ext import Extension
+from jinja2.lexer import Token
+
+# HTML's whitespace, not Python's: a non-breaking space matters.
+_whitespace_re = re.compile(r'[ \t\n\r\f]{2,}|[\t\r\f]')
+_raw_tags = ('pre', 'textarea', 'script', 'style')
+# Where the text starts doing something other than plain markup.
+_markers_re = re.compile(r'<(/?)(%s)\b|<|>|"|\'' % '|'.join(_raw_tags),
+                         re.IGNORECASE)
+
+
+#: Template name: (bytes before, bytes after) for each compiled template.
+saved = {}
+
+
+def _collapse(match):
+    return '\n' if '\n' in match.group() else ' '
+
+
+class Minifier(object):
+    """Minifies a template's data piece by piece, remembering whether the
+    last piece ended inside a tag, an attribute value or a raw element."""
+
+    def __init__(self):
+        self.tag = False
+        self.quote = None
+        self.raw = None
+
+    def minify(self, data):
+        out, pos = [], 0
+        for match in _markers_re.finditer(data):
+            marker = match.group()
+            if self.raw:
+                # Only the end of the raw element counts in there.
+                if not (match.group(1) and
+                        match.group(2).lower() == self.raw):
+                    continue
+                self.raw, self.tag = None, True
+                out.append(data[pos:match.end()])
+            elif self.quote:
+                if marker != self.quote:
+                    continue
+                self.quote = None
+                out.append(data[pos:match.end()])
+            else:
+                out.append(_whitespace_re.sub(_collapse,
+                                              data[pos:match.end()]))
+                if marker == '>':
+                    self.tag = False
+                elif marker in ('"', "'"):
+                    if self.tag:
+                        self.quote = marker
+                else:
+                    self.tag = True
+                    if match.group(2) and not match.group(1):
+                        self.raw = match.group(2).lower()
+            pos = match.end()
+        tail = data[pos:]
+        if not (self.raw or self.quote):
+            tail = _whitespace_re.sub(_collapse, tail)
+        out.append(tail)
+        return ''.join(out)
+
+
+class MinifyExtension(Extension):
+    """Collapse insignificant whitespace in templates' static HTML."""
+
+    def filter_stream(self, stream):
+        minifier = Minifier()
+        before = after = 0
+        previous, trans = None, False
+        for token in stream:
+            if previous == 'block_begin' and token.type == 'name':
+                if token.value == 'trans':
+                    trans = True
+                elif token.value == 'endtrans':
+                    trans = False
+            previous = token.type
+            if token.type == 'data' and not trans:
+                value = minifier.minify(token.value)
+                before += len(token.value.encode('utf-8'))
+                after += len(value.encode('utf-8'))
+                token = Token(token.lineno, token.type, value)
+            yield token
+        if stream.name is not None:
+            saved[stream.name] = (before, after)
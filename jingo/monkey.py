@@ -14,6 +14,11 @@ Usage::
     import jingo.monkey
     jingo.monkey.patch()
 
+Pass ``cache=True`` to have forms and bound fields remember their HTML, so
+a template that outputs the same form or field more than once only renders
+it once.  The HTML is rendered again if the form's data, errors, fields or
+widget attrs have changed since.
+
 This patch was originally developed by Jeff Balogh.
 
 """
@@ -27,7 +32,59 @@ def __html__(self):
     return six.text_type(self)
 
 
-def patch():
+def _cached(cache, key, state, render):
+    """Return the HTML stored under ``key`` in ``cache`` if it was rendered
+    in the same ``state``, or render it."""
+    hit = cache.get(key)
+    if hit is not None and hit[0] == state():
+        return hit[1]
+    html = render()
+    # Rendering can run validation, so look at the state afterwards.
+    cache[key] = (state(), html)
+    return html
+
+
+def _errors(form, name=None):
+    errors = form._errors
+    if errors is None:
+        return None
+    if name is None:
+        return dict((k, list(v)) for k, v in errors.items())
+    return list(errors.get(name, ()))
+
+
+def _data(data):
+    if hasattr(data, 'lists'):
+        return sorted(data.lists())
+    return sorted(data.items(), key=lambda item: item[0])
+
+
+def _form_state(form):
+    return (form.is_bound, _data(form.data), _errors(form),
+            [(name, dict(field.widget.attrs))
+             for name, field in form.fields.items()])
+
+
+def _field_state(bound_field):
+    form, field = bound_field.form, bound_field.field
+    return (form.is_bound, bound_field.value(),
+            _errors(form, bound_field.name), dict(field.widget.attrs))
+
+
+def _form_html(self):
+    return _cached(self.__dict__, '_jingo_html',
+                   lambda: _form_state(self), lambda: six.text_type(self))
+
+
+def _bound_field_html(self):
+    # Forms make a new BoundField every time one is asked for, so the
+    # form holds the cache.
+    cache = self.form.__dict__.setdefault('_jingo_field_html', {})
+    return _cached(cache, self.name,
+                   lambda: _field_state(self), lambda: six.text_type(self))
+
+
+def patch(cache=False):
     from django.forms import forms, formsets, util, widgets
 
     # Add __html__ methods to these classes:
@@ -48,3 +105,7 @@ def patch():
     for cls in classes:
         if not hasattr(cls, '__html__'):
             cls.__html__ = __html__
+
+    if cache:
+        forms.BaseForm.__html__ = _form_html
+        forms.BoundField.__html__ = _bound_field_html
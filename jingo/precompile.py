@@ -0,0 +1,186 @@
+"""
+Compile templates ahead of time.
+
+``manage.py jingo_compile`` uses this to turn every template jingo can load
+into a Python module, so production workers never have to run the Jinja
+lexer or parser.  Point ``JINGO_PRECOMPILED_TEMPLATES`` at the output and
+``get_env()`` will load from it first.
+
+Compiling can be spread over several processes; ``jingo.warmup()`` uses
+that to fill the template cache faster too.
+"""
+
+from __future__ import unicode_literals
+
+import marshal
+import multiprocessing
+import os
+import pickle
+import weakref
+
+from django.utils import six
+import jinja2
+
+from jingo.loaders import PrecompiledLoader
+
+# The Environment forked workers compile with.  Workers that weren't forked
+# build their own from the settings with ``jingo.get_env()``.
+_worker_env = None
+
+
+def list_templates(loader):
+    """Return the sorted names of every template ``loader`` can find.
+
+    Unlike ``ChoiceLoader.list_templates``, loaders that can't be listed
+    (like precompiled ones) and apps without a templates directory are
+    skipped instead of raising.
+    """
+    if isinstance(loader, jinja2.ChoiceLoader):
+        names = set()
+        for child in loader.loaders:
+            names.update(list_templates(child))
+        return sorted(names)
+    try:
+        return loader.list_templates()
+    except (TypeError, EnvironmentError):
+        return []
+
+
+def compile_templates(env, target, zip=None, filter_func=None, workers=1):
+    """Compile the templates ``env`` can load into modules for
+    :class:`jingo.loaders.PrecompiledLoader`.
+
+    Modules are written to the ``target`` directory, or to a zip file at
+    ``target`` if ``zip`` is ``'deflated'`` or ``'stored'``.  Only names
+    passing ``filter_func`` are compiled, in ``workers`` processes (0 for
+    one per CPU).
+
+    Returns a tuple of the compiled template names and a list of
+    ``(name, exception)`` pairs for the templates that failed to compile.
+    """
+    if zip:
+        from zipfile import ZipFile, ZipInfo, ZIP_DEFLATED, ZIP_STORED
+        archive = ZipFile(target, 'w', {'deflated': ZIP_DEFLATED,
+                                        'stored': ZIP_STORED}[zip])
+
+        def write(filename, data):
+            info = ZipInfo(filename)
+            info.external_attr = 0o755 << 16
+            archive.writestr(info, data)
+    else:
+        if not os.path.isdir(target):
+            os.makedirs(target)
+
+        def write(filename, data):
+            with open(os.path.join(target, filename), 'wb') as fp:
+                fp.write(data.encode('utf-8'))
+
+    names = [name for name in list_templates(env.loader)
+             if filter_func is None or filter_func(name)]
+    codes, errors = compile_all(env, names, workers, raw=True)
+    try:
+        for name, code in codes:
+            write(PrecompiledLoader.get_module_filename(name), code)
+    finally:
+        if zip:
+            archive.close()
+    return [name for name, _ in codes], errors
+
+
+def compile_all(env, names, workers=1, raw=False):
+    """Compile the templates called ``names`` in ``workers`` processes.
+
+    Returns a list of ``(name, code)`` pairs and a list of ``(name,
+    exception)`` pairs for the templates that failed, both in the order of
+    ``names``.  ``code`` is module source if ``raw`` is true, and marshalled
+    bytecode for :func:`load_compiled` otherwise.
+    """
+    global _worker_env
+    if workers == 0:
+        workers = multiprocessing.cpu_count()
+    if workers > 1 and len(names) > 1:
+        # Small shards keep every worker busy when some templates are much
+        # bigger than others.
+        size = max(1, len(names) // (workers * 4))
+        shards = [(names[i:i + size], raw)
+                  for i in range(0, len(names), size)]
+        _worker_env = env
+        pool = multiprocessing.Pool(workers)
+        try:
+            results = pool.map(_compile_shard, shards)
+        finally:
+            pool.terminate()
+            _worker_env = None
+    else:
+        results = [_compile(env, names, raw)]
+
+    codes, errors = [], []
+    for name, code, error in (r for shard in results for r in shard):
+        if error is None:
+            codes.append((name, code))
+        else:
+            cls, args = error
+            errors.append((name, cls(*args)))
+    return codes, errors
+
+
+def _compile_shard(args):
+    env = _worker_env
+    if env is None:
+        import django
+        django.setup()
+        from jingo import get_env
+        env = get_env()
+    return _compile(env, *args)
+
+
+def _compile(env, names, raw):
+    results = []
+    for name in names:
+        try:
+            source, filename, _ = env.loader.get_source(env, name)
+            code = env.compile(source, name, filename, raw=raw,
+                               defer_init=raw)
+        except Exception as e:
+            # Like a syntax error, an unreadable file only fails its own
+            # template.
+            results.append((name, None, _portable(e)))
+        else:
+            results.append((name, code if raw else marshal.dumps(code),
+                            None))
+    return results
+
+
+def _portable(e):
+    """Return an exception's class and arguments in a form that survives
+    pickling, which Jinja's syntax errors don't.  Other exceptions that
+    don't pickle become a ``TemplateError`` with their message."""
+    if isinstance(e, jinja2.TemplateSyntaxError):
+        return e.__class__, (e.message, e.lineno, e.name, e.filename)
+    if not isinstance(e, jinja2.TemplateError):
+        try:
+            pickle.loads(pickle.dumps(e))
+        except Exception:
+            return jinja2.TemplateError, ('%s: %s' % (
+                e.__class__.__name__, e),)
+        return e.__class__, e.args
+    return jinja2.TemplateError, (six.text_type(e),)
+
+
+def load_compiled(env, name, code):
+    """Put the template ``name``, compiled to ``code`` by
+    :func:`compile_all`, in ``env``'s template and bytecode caches, like
+    ``env.get_template`` would after compiling it."""
+    code = marshal.loads(code)
+    source, filename, uptodate = env.loader.get_source(env, name)
+    bcc = env.bytecode_cache
+    if bcc is not None:
+        bucket = bcc.get_bucket(env, name, filename, source)
+        if bucket.code is None:
+            bucket.code = code
+            bcc.set_bucket(bucket)
+    template = env.template_class.from_code(env, code, env.make_globals(None),
+                                            uptodate)
+    if env.cache is not None:
+        env.cache[(weakref.ref(env.loader), name)] = template
+    return template
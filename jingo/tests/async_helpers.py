@@ -0,0 +1,38 @@
+"""Coroutine helpers for test_async, which only imports this module on
+Python 3.6 and up, so the test module itself still imports (and skips) on
+older Pythons."""
+
+import asyncio
+
+
+async def greeting(name):
+    await asyncio.sleep(0)
+    return 'Hello %s' % name
+
+
+async def shout(s):
+    await asyncio.sleep(0)
+    return s.upper()
+
+
+async def user_processor(request):
+    await asyncio.sleep(0)
+    return {'user': 'fred'}
+
+
+async def person(name):
+    await asyncio.sleep(0)
+    return {'name': name}
+
+
+# The names cached_person has been called with.
+calls = []
+
+
+async def cached_person(name):
+    calls.append(name)
+    return {'name': name}
+
+
+async def collect(agen):
+    return [chunk async for chunk in agen]
@@ -4,3 +4,8 @@ from jingo import register
 @register.filter
 def test_filter(anything):
     return 'Success!'
+
+
+@register.function
+def test_function():
+    return 'Function!'
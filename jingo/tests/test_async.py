@@ -0,0 +1,183 @@
+from __future__ import unicode_literals
+
+import shutil
+import sys
+import tempfile
+
+from django.core.cache import caches
+from nose import SkipTest
+import jinja2
+from nose.tools import eq_
+try:
+    from unittest.mock import Mock, patch
+except ImportError:
+    from mock import Mock, patch
+
+import jingo
+
+if sys.version_info < (3, 6):
+    raise SkipTest('Async rendering needs Python 3.6.')
+
+import asyncio  # noqa
+from jingo import asyncsupport  # noqa
+from jingo.bccache import FileSystemBytecodeCache  # noqa
+from jingo.tests import async_helpers  # noqa
+
+
+def _run(coro):
+    return asyncio.get_event_loop().run_until_complete(coro)
+
+
+def _collect(agen):
+    return _run(async_helpers.collect(agen))
+
+
+def test_async_env():
+    env = asyncsupport.get_async_env()
+    assert env.is_async
+    assert env is asyncsupport.get_async_env()
+    # Everything but the compiled templates is shared.
+    sync = jingo.get_env()
+    assert env.loader is sync.loader
+    assert env.filters is sync.filters
+    assert env.globals is sync.globals
+    assert env.get_template('jinja_app/test.html') is not \
+        sync.get_template('jinja_app/test.html')
+
+
+def test_shared_bytecode_cache():
+    directory = tempfile.mkdtemp()
+    try:
+        bcc = FileSystemBytecodeCache(directory)
+        env = jingo.Environment(loader=jinja2.DictLoader({'a.html': 'a'}),
+                                bytecode_cache=bcc)
+        eq_(env.get_template('a.html').render(), 'a')
+        # The async Environment doesn't pick up the sync bytecode.
+        async_env = asyncsupport._build_async_env(env)
+        eq_(_run(async_env.get_template('a.html').render_async()), 'a')
+        eq_(bcc.stats(), {'hits': 0, 'misses': 2})
+
+        async_env = asyncsupport._build_async_env(env)
+        eq_(_run(async_env.get_template('a.html').render_async()), 'a')
+        eq_(bcc.stats(), {'hits': 1, 'misses': 2})
+    finally:
+        shutil.rmtree(directory)
+
+
+def test_render_to_string():
+    eq_(_run(asyncsupport.render_to_string(Mock(), 'jinja_app/test.html')),
+        'HELLO')
+
+
+def test_coroutine_helpers():
+    env = asyncsupport.get_async_env()
+    with patch.dict(env.globals, greeting=async_helpers.greeting), \
+            patch.dict(env.filters, shout=async_helpers.shout):
+        t = env.from_string('{{ greeting(name)|shout }}')
+        eq_(_run(t.render_async({'name': 'fred'})), 'HELLO FRED')
+        # The sync render runs the event loop itself.
+        eq_(t.render({'name': 'fred'}), 'HELLO FRED')
+
+
+def test_coroutine_context_processors():
+    def sync_processor(request):
+        return {'greeting': 'Hi'}
+
+    t = asyncsupport.get_async_env().from_string('{{ greeting }} {{ user }}')
+    with patch('jingo.get_standard_processors') as processors:
+        processors.return_value = [sync_processor,
+                                   async_helpers.user_processor]
+        eq_(_run(asyncsupport.render_to_string(Mock(), t)), 'Hi fred')
+
+
+def test_stream():
+    t = asyncsupport.get_async_env().from_string(
+        '{% for i in range(5) %}{{ i }}{{ "x" * 3 }}{% endfor %}')
+    eq_(_collect(asyncsupport.stream(Mock(), t, chunk_size=8)),
+        ['0xxx1xxx', '2xxx3xxx', '4xxx'])
+
+
+def test_async_inclusion_tag():
+    jingo.register.inclusion_tag('xx.html')(async_helpers.person)
+    env = asyncsupport.get_async_env()
+    with patch.dict(env.filters, shout=async_helpers.shout):
+        temp = env.from_string('<{{ name|shout }}>')
+        with patch.object(env, 'get_template', return_value=temp):
+            t = env.from_string('{{ person("fred") }}')
+            eq_(_run(t.render_async()), '<FRED>')
+
+
+def test_async_inclusion_tag_cache():
+    del async_helpers.calls[:]
+    jingo.register.inclusion_tag('xx.html', cache='default')(
+        async_helpers.cached_person)
+    caches['default'].clear()
+    env = asyncsupport.get_async_env()
+    temp = env.from_string('<{{ name }}>')
+    with patch.object(env, 'get_template', return_value=temp):
+        t = env.from_string('{{ cached_person("fred") }}')
+        for i in range(2):
+            eq_(_run(t.render_async()), '<fred>')
+    # Without a key the function has to run to build one.
+    eq_(async_helpers.calls, ['fred', 'fred'])
+
+
+def test_async_inclusion_tag_loads_template_once():
+    jingo.register.inclusion_tag('xx.html')(async_helpers.person)
+    env = asyncsupport.get_async_env()
+    temp = env.from_string('<{{ name }}>')
+    with patch.object(env, 'get_template', return_value=temp) as get_template:
+        t = env.from_string('{{ person("a") }}{{ person("b") }}')
+        eq_(_run(t.render_async()), '<a><b>')
+        eq_(_run(t.render_async()), '<a><b>')
+    eq_(get_template.call_count, 1)
+
+
+def test_async_inclusion_tag_cache_keys():
+    class Thing(object):
+        def __init__(self, pk):
+            self.pk = pk
+
+        def __str__(self):
+            return 'thing %s' % self.pk
+
+    del async_helpers.calls[:]
+    # A key function returning a single value, as in the README.
+    jingo.register.inclusion_tag('xx.html', cache='default',
+                                 key=lambda name: name.pk)(
+        async_helpers.cached_person)
+    caches['default'].clear()
+    env = asyncsupport.get_async_env()
+    temp = env.from_string('<{{ name }}>')
+    with patch.object(env, 'get_template', return_value=temp):
+        t = env.from_string('{{ cached_person(x) }}')
+        eq_(_run(t.render_async({'x': Thing(1)})), '<thing 1>')
+        eq_(_run(t.render_async({'x': Thing(1)})), '<thing 1>')
+        eq_(len(async_helpers.calls), 1)
+
+        # Without a key, equal text makes equal keys whatever the repr.
+        jingo.register.inclusion_tag('xx.html', cache='default')(
+            async_helpers.cached_person)
+        eq_(_run(t.render_async({'x': Thing(2)})), '<thing 2>')
+        with patch.object(temp, 'render_async') as render_async:
+            eq_(_run(t.render_async({'x': Thing(2)})), '<thing 2>')
+        assert not render_async.called
+
+
+def test_cache_tag():
+    caches['default'].clear()
+    env = asyncsupport.get_async_env()
+    with patch.dict(env.globals, greeting=async_helpers.greeting):
+        t = env.from_string(
+            '{% cache "k" %}{{ greeting(name) }}{% endcache %}')
+        eq_(_run(t.render_async({'name': 'fred'})), 'Hello fred')
+        eq_(_run(t.render_async({'name': 'bob'})), 'Hello fred')
+
+
+def test_cache_tag_miss_leaves_lock_alone():
+    caches['default'].clear()
+    env = asyncsupport.get_async_env()
+    with patch.object(caches['default'], 'delete') as delete:
+        t = env.from_string('{% cache "k" %}x{% endcache %}')
+        eq_(_run(t.render_async({})), 'x')
+    assert not delete.called
@@ -1,13 +1,28 @@
 from __future__ import unicode_literals
 
+import functools
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+from django.apps import apps
+from django.contrib.auth.context_processors import auth
+from django.core.cache import caches
+from django.http import StreamingHttpResponse
 from django.shortcuts import render
+from django.template import Context
+from django.template.context_processors import static
+from django.test.utils import override_settings
+from django.utils import translation
 import jinja2
 
 from nose.tools import eq_
 try:
-    from unittest.mock import Mock, patch, sentinel
+    from unittest.mock import MagicMock, Mock, patch, sentinel
 except ImportError:
-    from mock import Mock, patch, sentinel
+    from mock import MagicMock, Mock, patch, sentinel
 
 import jingo
 
@@ -53,3 +68,358 @@ def test_helpers_loaded():
     """Test that helpers are loaded correctly."""
     s = render_string('{{ "something"|test_filter }}', {})
     eq_('Success!', s)
+
+
+def test_layered_context():
+    c = jingo.LayeredContext([{'a': 1, 'b': 1}, {}, {'b': 2, 'c': 3}])
+    eq_(c['a'], 1)
+    eq_(c['b'], 2)
+    assert 'c' in c
+    assert 'd' not in c
+    eq_(dict(c), {'a': 1, 'b': 2, 'c': 3})
+    eq_(len(c), 3)
+    assert c
+    assert not jingo.LayeredContext([{}, {}])
+    eq_(c.copy(), {'a': 1, 'b': 2, 'c': 3})
+
+
+def test_render_error():
+    # The template's own error, not one from building the traceback.
+    t = jingo.get_env().from_string('{{ x.y() }}')
+    try:
+        t.render({'x': {}})
+    except jinja2.UndefinedError:
+        pass
+    else:
+        assert False, 'UndefinedError not raised'
+
+
+def test_render_django_context():
+    context = Context({'a': 'a', 'b': 'b'})
+    context.update({'b': 'B'})
+    t = jingo.get_env().from_string('{% set a = "x" %}{{ a }}{{ b }}')
+    eq_(t.render(context), 'xB')
+    # Templates set their own variables; the caller's context is untouched.
+    eq_(context['a'], 'a')
+
+
+def test_render_context_shadows_globals():
+    t = jingo.get_env().from_string('{{ url }}')
+    eq_(t.render({'url': 'mine'}), 'mine')
+
+
+@patch('jingo.get_standard_processors')
+def test_render_to_string_processors_win(mock_processors):
+    mock_processors.return_value = [lambda request: {'a': 'processor'}]
+    template = jingo.get_env().from_string('{{ a }} {{ b }}')
+    context = {'a': 'caller', 'b': 'caller'}
+    eq_(jingo.render_to_string(Mock(), template, context),
+        'processor caller')
+    eq_(context, {'a': 'caller', 'b': 'caller'})
+
+
+@patch('jingo.get_standard_processors')
+def test_render_to_streaming_response(mock_processors):
+    mock_processors.return_value = [lambda request: {'b': '!'}]
+    template = jingo.get_env().from_string(
+        '{% for i in range(5) %}{{ a }}{% endfor %}{{ b }}')
+    response = jingo.render_to_streaming_response(
+        Mock(), template, {'a': 'xy'}, chunk_size=3, status=202)
+
+    assert isinstance(response, StreamingHttpResponse)
+    eq_(response.status_code, 202)
+    eq_(list(response.streaming_content),
+        [b'xyxy', b'xyxy', b'xy!'])
+
+
+def test_render_to_streaming_response_default_chunk_size():
+    template = jingo.get_env().from_string('{{ "x" * 10000 }}!')
+    response = jingo.render_to_streaming_response(Mock(), template)
+    eq_(b''.join(response.streaming_content), b'x' * 10000 + b'!')
+
+
+def _in_threads(func, count=5):
+    threads = [threading.Thread(target=func) for i in range(count)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+
+def test_get_env_threadsafe():
+    def slow_env(**opts):
+        time.sleep(0.01)
+        return MagicMock()
+
+    old_env = jingo._env
+    jingo._env = None
+    envs = []
+    try:
+        with patch('jingo.Environment', side_effect=slow_env) as env_cls:
+            _in_threads(lambda: envs.append(jingo.get_env()))
+    finally:
+        jingo._env = old_env
+    eq_(env_cls.call_count, 1)
+    eq_(len(set(map(id, envs))), 1)
+
+
+def test_load_helpers_threadsafe():
+    imported = []
+
+    def slow_import(name):
+        time.sleep(0.01)
+        imported.append(name)
+
+    loaded = []
+    with patch.object(jingo, '_helpers_loaded', False):
+        with patch('jingo.import_module', side_effect=slow_import):
+            def load():
+                jingo.load_helpers()
+                loaded.append(list(imported))
+            _in_threads(load)
+    assert 'jingo.tests.django_app.helpers' in imported
+    eq_(len(imported), len(set(imported)))
+    # Nobody went ahead before the helpers were imported.
+    eq_(loaded, [imported] * 5)
+
+
+def test_warmup():
+    env = jingo.get_env()
+    env.cache.clear()
+    loaded = jingo.warmup(['jinja_app/test_*.html', 'jinja_app/test.html',
+                           'django_app/test.html'])
+    eq_(sorted(loaded), ['jinja_app/test.html',
+                         'jinja_app/test_nonoverride.html',
+                         'jinja_app/test_override.html'])
+    eq_(len(env.cache), 3)
+
+
+def test_warmup_in_processes():
+    env = jingo.get_env()
+    env.cache.clear()
+    names = ['jinja_app/test.html', 'jinja_app/test_override.html']
+    with override_settings(JINGO_COMPILE_WORKERS=2):
+        eq_(jingo.warmup(names), names)
+    eq_(len(env.cache), 2)
+    # The templates came back compiled; nothing is loaded here.
+    with patch.object(env.loader, 'load') as load:
+        eq_(env.get_template('jinja_app/test.html').render(), 'HELLO')
+    assert not load.called
+
+
+def test_warmup_errors():
+    with patch('jingo.get_env') as get_env:
+        get_env.return_value.get_template.side_effect = (
+            jinja2.TemplateSyntaxError('bad', 1))
+        eq_(jingo.warmup(['a.html']), [])
+
+
+def test_warmup_skips_files_that_arent_templates():
+    directory = tempfile.mkdtemp()
+    try:
+        with open(os.path.join(directory, 'logo.png'), 'wb') as fp:
+            fp.write(b'\x89PNG\r\n\x1a\n\xff\xfe')
+        with open(os.path.join(directory, 'a.html'), 'w') as fp:
+            fp.write('a')
+        env = jingo.Environment(loader=jinja2.FileSystemLoader(directory))
+        with patch('jingo.get_env', return_value=env):
+            with patch('jingo.log') as log:
+                eq_(jingo.warmup(['*']), ['a.html'])
+        assert 'logo.png' in log.warning.call_args[0]
+    finally:
+        shutil.rmtree(directory)
+
+
+def test_prefork():
+    env = jingo.get_env()
+    env.cache.clear()
+    with patch('gc.freeze', create=True) as freeze:
+        loaded = jingo.prefork(['jinja_app/*'])
+    assert freeze.called
+    eq_(len(loaded), 3)
+    eq_(len(env.cache), 3)
+
+    env.cache.clear()
+    with patch.object(env.cache, 'capacity', 1):
+        with patch('jingo.log') as log:
+            with patch('gc.freeze', create=True):
+                jingo.prefork(['jinja_app/*'])
+    assert 'too small' in log.warning.call_args[0][0]
+
+
+def test_prefork_default_templates():
+    with patch('jingo.warmup', return_value=[]) as warmup:
+        with patch('gc.freeze', create=True):
+            jingo.prefork()
+            with override_settings(JINGO_WARMUP_TEMPLATES=['a.html']):
+                jingo.prefork()
+    eq_(warmup.call_args_list[0][0][0], jingo.PREFORK_TEMPLATES)
+    eq_(warmup.call_args_list[1][0][0], ['a.html'])
+
+
+def test_warmup_on_ready():
+    config = apps.get_app_config('jingo')
+    with patch('jingo.warmup') as warmup:
+        config.ready()
+        assert not warmup.called
+        with override_settings(JINGO_WARMUP=True):
+            config.ready()
+        assert warmup.called
+
+
+def test_inclusion_tag_loads_template_once():
+    @jingo.register.inclusion_tag('xx.html')
+    def tag(x):
+        return {'z': x}
+
+    env = jingo.get_env()
+    temp = jinja2.environment.Template('<{{ z }}>')
+    with patch.object(env, 'get_template', return_value=temp) as get_template:
+        t = env.from_string('{{ tag(1) }}{{ tag(2) }}')
+        eq_('<1><2>', t.render())
+        eq_('<1><2>', t.render())
+        eq_(get_template.call_count, 1)
+
+        # Changed templates are picked up under auto_reload.
+        with patch.object(env, 'auto_reload', True):
+            with patch.object(jinja2.Template, 'is_up_to_date', False):
+                eq_('<1><2>', t.render())
+        eq_(get_template.call_count, 3)
+
+
+def _cached_tag(**kwargs):
+    calls = []
+
+    @jingo.register.inclusion_tag('xx.html', cache='default', **kwargs)
+    def cached_tag(x):
+        calls.append(x)
+        return {'z': x}
+
+    caches['default'].clear()
+    return calls
+
+
+def test_inclusion_tag_cache():
+    calls = _cached_tag()
+    env = jingo.get_env()
+    temp = jinja2.environment.Template('<{{ z }}>')
+    with patch.object(env, 'get_template', return_value=temp):
+        with patch.object(temp, 'render', wraps=temp.render) as render:
+            t = env.from_string('{{ cached_tag(1) }}{{ cached_tag(1) }}')
+            eq_('<1><1>', t.render())
+            eq_(render.call_count, 1)
+            eq_(calls, [1, 1])
+
+            # Each language gets its own copy.
+            with translation.override('xx'):
+                eq_('<1><1>', t.render())
+            eq_(render.call_count, 2)
+
+
+def test_inclusion_tag_cache_key():
+    calls = _cached_tag(key=lambda x: x, version=2)
+    env = jingo.get_env()
+    temp = jinja2.environment.Template('<{{ z }}>')
+    with patch.object(env, 'get_template', return_value=temp):
+        t = env.from_string('{{ cached_tag(1) }}{{ cached_tag(1) }}')
+        eq_('<1><1>', t.render())
+        # The function isn't even called when the key is cached.
+        eq_(calls, [1])
+
+
+def test_inclusion_tag_cache_key_by_text():
+    class Thing(object):
+        def __init__(self, pk):
+            self.pk = pk
+
+        def __str__(self):
+            return 'thing %s' % self.pk
+
+    calls = _cached_tag()
+    env = jingo.get_env()
+    temp = jinja2.environment.Template('<{{ z }}>')
+    with patch.object(env, 'get_template', return_value=temp):
+        with patch.object(temp, 'render', wraps=temp.render) as render:
+            t = env.from_string('{{ cached_tag(x) }}')
+            # Equal text, different reprs: one key.
+            eq_(t.render({'x': Thing(1)}), '<thing 1>')
+            eq_(t.render({'x': Thing(1)}), '<thing 1>')
+            eq_(render.call_count, 1)
+            eq_(t.render({'x': Thing(2)}), '<thing 2>')
+            eq_(render.call_count, 2)
+    eq_(len(calls), 3)
+
+
+@override_settings(JINGO_LAZY_CONTEXT_PROCESSORS=True,
+                   JINGO_CONTEXT_PROCESSOR_KEYS={
+                       'jingo.tests.test_basics.used': ['a'],
+                       'jingo.tests.test_basics.unused': ['b']})
+def test_lazy_context_processors():
+    calls = []
+
+    def used(request):
+        calls.append('used')
+        return {'a': 'A'}
+
+    def unused(request):
+        calls.append('unused')
+        return {'b': 'B'}
+
+    def undeclared(request):
+        # Say, {} for anonymous users: it might still have 'a' next time.
+        calls.append('undeclared')
+        return {}
+
+    env = jinja2.Environment(loader=jinja2.DictLoader({
+        'a.html': '{{ a }}',
+        'b.html': '{% include name %}',
+    }))
+    with patch('jingo.get_standard_processors') as processors:
+        processors.return_value = [used, unused, undeclared]
+        for i in range(2):
+            eq_(jingo.render_to_string(Mock(), env.get_template('a.html')),
+                'A')
+        eq_(calls, ['used', 'undeclared'] * 2)
+
+        # Anything goes when we can't tell what the template reads.
+        del calls[:]
+        jingo.render_to_string(Mock(), env.get_template('b.html'),
+                               {'name': 'a.html'})
+        eq_(calls, ['used', 'unused', 'undeclared'])
+
+
+def test_context_processor_keys():
+    path = 'django.contrib.auth.context_processors.auth'
+    assert 'user' in jingo.CONTEXT_PROCESSOR_KEYS[path]
+    env = jinja2.Environment(
+        loader=jinja2.DictLoader({'a.html': '{{ STATIC_URL }}'}))
+    template = env.get_template('a.html')
+    with patch('jingo.get_standard_processors') as processors:
+        processors.return_value = [auth, static]
+        eq_(jingo._context_processors(template), [auth, static])
+        with override_settings(JINGO_LAZY_CONTEXT_PROCESSORS=True):
+            eq_(jingo._context_processors(template), [static])
+
+
+@override_settings(JINGO_LAZY_CONTEXT_PROCESSORS=True)
+def test_lazy_context_processors_without_names():
+    calls = []
+
+    def processor(name, request):
+        calls.append(name)
+        return {name: name}
+
+    class Processor(object):
+        def __call__(self, request):
+            calls.append('instance')
+            return {'instance': 'instance'}
+
+    partial = functools.partial(processor, 'partial')
+    instance = Processor()
+    env = jinja2.Environment(loader=jinja2.DictLoader({'a.html': '{{ a }}'}))
+    with patch('jingo.get_standard_processors') as processors:
+        processors.return_value = [partial, instance]
+        for i in range(2):
+            jingo.render_to_string(Mock(), env.get_template('a.html'))
+    # Their keys aren't read, but there's no way to declare them.
+    eq_(calls, ['partial', 'instance'] * 2)
@@ -0,0 +1,65 @@
+from __future__ import unicode_literals
+
+import shutil
+import tempfile
+
+from django.test.utils import override_settings
+import jinja2
+from nose.tools import eq_
+
+from jingo import bccache
+
+
+def _env(cache, source='Hello {{ name }}'):
+    loader = jinja2.DictLoader({'hello.html': source})
+    return jinja2.Environment(loader=loader, bytecode_cache=cache)
+
+
+def _check_hit_and_miss(cache):
+    eq_(_env(cache).get_template('hello.html').render(name='you'),
+        'Hello you')
+    eq_(cache.stats(), {'hits': 0, 'misses': 1})
+
+    # A fresh environment has an empty template cache but should find the
+    # bytecode the first one stored.
+    eq_(_env(cache).get_template('hello.html').render(name='me'), 'Hello me')
+    eq_(cache.stats(), {'hits': 1, 'misses': 1})
+
+    # Changing the source must never load the old bytecode.
+    eq_(_env(cache, 'Bye {{ name }}').get_template('hello.html')
+        .render(name='you'), 'Bye you')
+    eq_(cache.stats(), {'hits': 1, 'misses': 2})
+
+
+def test_filesystem_cache():
+    directory = tempfile.mkdtemp()
+    try:
+        _check_hit_and_miss(bccache.FileSystemBytecodeCache(directory))
+    finally:
+        shutil.rmtree(directory)
+
+
+def test_django_cache():
+    cache = bccache.DjangoCacheBytecodeCache(prefix='jingo-test:')
+    cache.cache.clear()
+    _check_hit_and_miss(cache)
+
+
+def test_reset_stats():
+    cache = bccache.DjangoCacheBytecodeCache(prefix='jingo-test-reset:')
+    _env(cache).get_template('hello.html')
+    cache.reset_stats()
+    eq_(cache.stats(), {'hits': 0, 'misses': 0})
+
+
+def test_get_bytecode_cache():
+    eq_(bccache.get_bytecode_cache(), None)
+
+    config = {
+        'BACKEND': 'jingo.bccache.DjangoCacheBytecodeCache',
+        'OPTIONS': {'alias': 'default', 'timeout': 60},
+    }
+    with override_settings(JINGO_BYTECODE_CACHE=config):
+        cache = bccache.get_bytecode_cache()
+    assert isinstance(cache, bccache.DjangoCacheBytecodeCache)
+    eq_(cache.timeout, 60)
@@ -0,0 +1,90 @@
+from __future__ import unicode_literals
+
+import json
+
+from django.core.management import call_command
+from django.http import Http404
+from django.test import RequestFactory
+from django.test.utils import override_settings
+from django.utils.six import StringIO
+from nose.tools import eq_, assert_raises
+try:
+    from unittest.mock import patch
+except ImportError:
+    from mock import patch
+
+import jingo
+from jingo import metrics
+from jingo.cache import TemplateCache, template_size
+from jingo.views import template_cache_stats
+
+
+def test_lru():
+    cache = TemplateCache(2, pinned=['base/*'])
+    cache[(None, 'a')] = 'A'
+    cache[(None, 'base/page.html')] = 'P'
+    cache[(None, 'b')] = 'B'
+    eq_(cache.get((None, 'a')), 'A')
+    cache[(None, 'c')] = 'C'  # b was used least recently.
+    eq_(cache.get((None, 'b')), None)
+    eq_(sorted(k[1] for k in cache.keys()), ['a', 'base/page.html', 'c'])
+    assert (None, 'base/page.html') in cache
+    eq_(cache[(None, 'base/page.html')], 'P')
+    assert_raises(KeyError, lambda: cache[(None, 'b')])
+
+    stats = cache.stats()
+    eq_((stats['hits'], stats['misses'], stats['evictions']), (2, 2, 1))
+    eq_((stats['size'], stats['pinned'], stats['capacity']), (3, 1, 2))
+    eq_(stats['hit_rate'], 0.5)
+
+    del cache[(None, 'base/page.html')]
+    del cache[(None, 'a')]
+    eq_(len(cache), 1)
+    cache.clear()
+    eq_(len(cache), 0)
+
+
+def test_unbounded():
+    cache = TemplateCache(-1)
+    for i in range(1000):
+        cache[(None, i)] = i
+    eq_((len(cache), cache.evictions), (1000, 0))
+
+
+def test_template_size():
+    env = jingo.get_env()
+    small = env.from_string('x')
+    big = env.from_string('{% block a %}' + '{{ x|nl2br }}' * 200 +
+                          '{% endblock %}')
+    assert 0 < template_size(small) < template_size(big)
+    with patch.object(metrics, 'enabled', return_value=True):
+        wrapped = env.from_string('{% block a %}' + '{{ x|nl2br }}' * 200 +
+                                  '{% endblock %}')
+    eq_(template_size(wrapped), template_size(big))
+
+
+def test_settings():
+    with override_settings(JINGO_TEMPLATE_CACHE_SIZE=10,
+                           JINGO_PINNED_TEMPLATES=['base.html']):
+        cache = jingo._build_env().cache
+    eq_((cache.capacity, cache.pinned), (10, ('base.html',)))
+    with override_settings(JINGO_TEMPLATE_CACHE_SIZE=0):
+        eq_(jingo._build_env().cache, None)
+
+
+def test_command():
+    out = StringIO()
+    call_command('jingo_cache_stats', 'jinja_app/*', stdout=out)
+    assert 'jinja_app/test.html' in out.getvalue()
+    assert 'evictions' in out.getvalue()
+
+
+def test_view():
+    request = RequestFactory().get('/', {'memory': ''})
+    with override_settings(DEBUG=False):
+        assert_raises(Http404, template_cache_stats, request)
+    jingo.get_env().get_template('jinja_app/test.html')
+    with override_settings(DEBUG=True):
+        stats = json.loads(template_cache_stats(request).content.decode())
+    assert stats['hits'] + stats['misses']
+    assert 'jinja_app/test.html' in [t['name'] for t in stats['templates']]
@@ -0,0 +1,188 @@
+from __future__ import unicode_literals
+
+import os
+import shutil
+import sys
+import tempfile
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test.utils import override_settings
+from django.utils.six import StringIO
+import jinja2
+from nose.tools import eq_, assert_raises
+try:
+    from unittest.mock import patch
+except ImportError:
+    from mock import patch
+
+import jingo
+from jingo.discovery import LazyHelpers, read_manifest, write_manifest
+
+HELPERS = 'jingo.tests.django_app.helpers'
+
+
+def setup():
+    global directory, manifest
+    directory = tempfile.mkdtemp()
+    manifest = os.path.join(directory, 'helpers.json')
+
+
+def teardown():
+    shutil.rmtree(directory)
+
+
+def test_lazy_helpers():
+    loaded = []
+
+    def load(module):
+        loaded.append(module)
+        helpers.pending.pop('upper')
+        helpers['upper'] = module
+
+    helpers = LazyHelpers({'lower': 'builtin'}, load)
+    helpers.pending['upper'] = 'app.helpers'
+    assert 'lower' in helpers
+    eq_(loaded, [])
+    assert 'upper' in helpers
+    eq_(helpers['upper'], 'app.helpers')
+    eq_(helpers.get('nope'), None)
+    assert_raises(KeyError, lambda: helpers['nope'])
+    eq_(loaded, ['app.helpers'])
+
+
+def test_manifest():
+    entries = [{'module': HELPERS, 'filters': ['test_filter'],
+                'globals': []}]
+    write_manifest(manifest, ['a', 'b'], entries)
+    eq_(read_manifest(manifest, ['a', 'b']), entries)
+    # A manifest for other apps, or none at all, doesn't count.
+    eq_(read_manifest(manifest, ['a']), None)
+    eq_(read_manifest(manifest + '.nope', ['a', 'b']), None)
+
+
+def test_manifest_mtimes():
+    app = os.path.join(directory, 'app')
+    os.mkdir(app)
+    helpers = os.path.join(app, 'helpers.py')
+    with open(helpers, 'w') as fp:
+        fp.write('')
+    entries = [{'module': 'app.helpers', 'file': helpers, 'filters': [],
+                'globals': []}]
+    os.utime(app, (1000, 1000))
+    os.utime(helpers, (1000, 1000))
+    write_manifest(manifest, ['app'], entries, [app])
+    eq_(read_manifest(manifest, ['app']), entries)
+
+    # A helpers module changed.
+    os.utime(helpers, (2000, 2000))
+    eq_(read_manifest(manifest, ['app']), None)
+
+    # An app got a new file, which may be a helpers module.
+    write_manifest(manifest, ['app'], entries, [app])
+    with open(os.path.join(app, 'other.py'), 'w') as fp:
+        fp.write('')
+    os.utime(app, (3000, 3000))
+    eq_(read_manifest(manifest, ['app']), None)
+
+
+def _load_helpers():
+    with patch.object(jingo, '_helpers_loaded', False):
+        jingo.load_helpers()
+
+
+def test_load_helpers_writes_manifest():
+    if os.path.exists(manifest):
+        os.remove(manifest)
+    with override_settings(JINGO_HELPERS_MANIFEST=manifest):
+        _load_helpers()
+        helpers = read_manifest(manifest, [c.name for c in
+                                           jingo.apps.get_app_configs()])
+        modules = [e['module'] for e in helpers]
+        eq_(modules, ['django.contrib.admin.helpers', HELPERS])
+        eq_(helpers[1]['filters'], ['test_filter'])
+        eq_(helpers[1]['globals'], ['test_function'])
+        assert helpers[1]['file'].endswith(
+            os.path.join('django_app', 'helpers.py'))
+
+        # Next time nothing is probed.
+        with patch('jingo.has_helpers') as has_helpers:
+            with patch('jingo.import_module') as import_module:
+                _load_helpers()
+        assert not has_helpers.called
+        eq_([c[0][0] for c in import_module.call_args_list], modules)
+
+
+def test_lazy_loading():
+    app_names = [c.name for c in jingo.apps.get_app_configs()]
+    write_manifest(manifest, app_names, [
+        {'module': HELPERS, 'filters': ['test_filter'], 'globals': []}])
+    old_env = jingo._env
+    jingo._env = None
+    try:
+        with override_settings(JINGO_HELPERS_MANIFEST=manifest,
+                               JINGO_LAZY_HELPERS=True):
+            env = jingo.get_env()
+            # Make the module register itself with this Environment.
+            with patch.dict(sys.modules):
+                sys.modules.pop(HELPERS, None)
+                with patch('jingo.import_module',
+                           wraps=jingo.import_module) as import_module:
+                    _load_helpers()
+                    t = env.from_string('{{ 1 }}')
+                    assert not import_module.called
+                    t = env.from_string('{{ "x"|test_filter }}')
+                import_module.assert_called_once_with(HELPERS)
+                eq_(t.render(), 'Success!')
+    finally:
+        jingo._env = old_env
+
+
+def test_lazy_loading_imports_functions():
+    app_names = [c.name for c in jingo.apps.get_app_configs()]
+    write_manifest(manifest, app_names, [
+        {'module': HELPERS, 'filters': ['test_filter'],
+         'globals': ['test_function']}])
+    old_env = jingo._env
+    jingo._env = None
+    try:
+        with override_settings(JINGO_HELPERS_MANIFEST=manifest,
+                               JINGO_LAZY_HELPERS=True):
+            env = jingo.get_env()
+            with patch.dict(sys.modules):
+                sys.modules.pop(HELPERS, None)
+                _load_helpers()
+            # Imports without context and includes with local variables
+            # get a copy of the globals, which needs the function in it.
+            env.loader = jinja2.DictLoader({
+                'macros.html': '{% macro f() %}{{ test_function() }}'
+                               '{% endmacro %}',
+                'include.html': '{{ x }} {{ test_function() }}',
+            })
+            t = env.from_string('{% import "macros.html" as m %}{{ m.f() }}')
+            eq_(t.render(), 'Function!')
+            t = env.from_string('{% for x in [1] %}'
+                                '{% include "include.html" %}{% endfor %}')
+            eq_(t.render(), '1 Function!')
+    finally:
+        jingo._env = old_env
+
+
+def test_helpers_report():
+    # Importing a module again replaces its entry.
+    jingo._import_helpers(HELPERS)
+    jingo._import_helpers(HELPERS)
+    eq_(list(jingo._helpers_report).count(HELPERS), 1)
+
+
+def test_command():
+    out = StringIO()
+    call_command('jingo_helpers', stdout=out)
+    assert HELPERS in out.getvalue()
+    assert 'Finding helpers modules took' in out.getvalue()
+
+    assert_raises(CommandError, call_command, 'jingo_helpers',
+                  write_manifest=True)
+    with override_settings(JINGO_HELPERS_MANIFEST=manifest):
+        call_command('jingo_helpers', write_manifest=True, stdout=out)
+    assert os.path.exists(manifest)
@@ -4,19 +4,24 @@
 from __future__ import unicode_literals
 
 import cgi
+import itertools
 from datetime import datetime
 from collections import namedtuple
 
-from django.utils import six
+from django.core.cache import caches
+from django.core.urlresolvers import set_script_prefix
+from django.http import QueryDict
+from django.test.utils import override_settings
+from django.utils import six, translation
 from jinja2 import Markup
 try:
     from unittest.mock import patch
 except ImportError:
     from mock import patch
-from nose.tools import eq_
+from nose.tools import eq_, assert_raises
 
 from jingo import ext as helpers
-from jingo import register
+from jingo import get_env, register
 
 from .utils import htmleq_, render
 
@@ -98,6 +103,39 @@ def test_fe_markup():
         yield _check, f, v, e
 
 
+def _compiled(source):
+    return get_env().compile(source, raw=True)
+
+
+def test_format_folding():
+    context = {'a': '<em>1</em>', 'b': Markup('<b>2</b>'), 'n': 3,
+               '_': lambda s: s + '!'}
+    formats = ['{0} and {x}', '{} {}%', '{{{0}}} {0}', '100% {x}', '{x}']
+    for fmt, name in itertools.product(formats, ['f', 'fe']):
+        filter_ = '|%s(a, n, x=b)' % name
+        literal = '{{ "%s"%s }}' % (fmt, filter_)
+        assert 'f.parsed' in _compiled(literal)
+        unfolded = '{{ fmt%s }}' % filter_
+        eq_(render(literal, context),
+            render(unfolded, dict(context, fmt=fmt)))
+
+        translated = '{{ _("%s")%s }}' % (fmt, filter_)
+        assert '%s.text' % name in _compiled(translated)
+        eq_(render(translated, context),
+            render(unfolded, dict(context, fmt=fmt + '!')))
+
+
+def test_format_not_folded():
+    for source in ['{{ "{0!r}"|f(a) }}', '{{ "{0:>5}"|fe(a) }}',
+                   '{{ "{0.real}"|f(a) }}', '{{ "{} {0}"|f(a) }}',
+                   '{{ "{0}"|f(*a) }}', '{{ s|f(a) }}', '{{ "{0}"|f(1) }}']:
+        assert 'f.parsed' not in _compiled(source), source
+    eq_(render('{{ "{0!r}|{0:>3}"|f(a) }}', {'a': 'x'}), '&#39;x&#39;|  x')
+
+    with patch.dict(get_env().filters, {'f': lambda s, v: s + v}):
+        assert 'f.parsed' not in _compiled('{{ "{0}"|f(a) }}')
+
+
 def test_nl2br():
     text = "some\ntext\n\nwith\nnewlines"
     s = render('{{ x|nl2br }}', {'x': text})
@@ -125,6 +163,43 @@ def test_datetime_unicode():
     helpers.datetime_filter(datetime.now(), fmt)
 
 
+def test_datetime_matches_strftime():
+    formats = ['%Y-%m-%d %H:%M:%S', '%B %e, %Y', '%b %d %y', '%A %a',
+               '%I:%M %p', '%j', '100%% %Y%%', '%e.%m.', 'no directives',
+               '%c', '%x %X', '%U']
+    times = [datetime(2009, 12, 25, 10, 11, 12), datetime(2012, 2, 29),
+             datetime(1999, 7, 4, 23, 59, 1), datetime(2010, 1, 1, 12),
+             datetime(2010, 1, 1, 12).date()]
+    for fmt, t in itertools.product(formats, times):
+        eq_(helpers.datetime_filter(t, fmt), t.strftime(fmt))
+
+
+def test_datetimes():
+    times = [datetime(2009, 12, 25), None, datetime(2010, 1, 2)]
+    eq_(helpers.datetimes_filter(times),
+        ['December 25, 2009', '', 'January  2, 2010'])
+    s = render('{{ ts|datetimes("%Y")|join(",") }}', {'ts': times})
+    eq_(s, '2009,,2010')
+
+
+def test_datetime_default_per_language():
+    def ugettext(s):
+        return '%d.%m.%Y' if translation.get_language() == 'de' else s
+
+    time = datetime(2009, 12, 25)
+    helpers._default_format.cache_clear()
+    try:
+        with patch.object(helpers, '_', side_effect=ugettext) as _:
+            with translation.override('de'):
+                eq_(helpers.datetime_filter(time), '25.12.2009')
+                eq_(helpers.datetime_filter(time), '25.12.2009')
+            with translation.override('en-us'):
+                eq_(helpers.datetime_filter(time), 'December 25, 2009')
+            eq_(_.call_count, 2)
+    finally:
+        helpers._default_format.cache_clear()
+
+
 def test_ifeq():
     eq_context = {'a': 1, 'b': 1}
     neq_context = {'a': 1, 'b': 2}
@@ -275,3 +350,170 @@ def test_urlparams_fragment():
     eq_(u'/#foo', helpers.urlparams('/', fragment='foo'))
     eq_(u'/#bar', helpers.urlparams('/#foo', fragment='bar'))
     eq_(u'/', helpers.urlparams('/#foo', fragment=''))
+
+
+def test_register_installs_original():
+    def h(s):
+        return s
+    h.__name__ = 'h' if six.PY3 else b'h'
+    env = get_env()
+
+    # With or without parentheses, templates call the function itself.
+    register.filter(h)
+    assert env.filters['h'] is h
+    register.filter()(h)
+    assert env.filters['h'] is h
+    register.function(override=True)(h)
+    assert env.globals['h'] is h
+
+
+class TestCacheTag(object):
+
+    def setup(self):
+        caches['default'].clear()
+        self.counter = itertools.count()
+
+    def render(self, s, **context):
+        context['counter'] = lambda: next(self.counter)
+        return render(s, context)
+
+    def test_cached(self):
+        t = ('{% for i in range(3) %}'
+             '{% cache "k" %}{{ counter() }}{% endcache %}'
+             '{% endfor %}')
+        eq_(self.render(t), '000')
+        eq_(self.render(t), '000')
+
+    def test_vary(self):
+        t = '{% cache "k", x, y %}{{ counter() }}{% endcache %}'
+        eq_(self.render(t, x=1, y=1), '0')
+        eq_(self.render(t, x=1, y=2), '1')
+        eq_(self.render(t, x=1, y=1), '0')
+
+    def test_vary_by_text(self):
+        class Thing(object):
+            def __str__(self):
+                return 'thing'
+
+        t = '{% cache "k", x %}{{ counter() }}{% endcache %}'
+        # Not the repr, which differs for every object.
+        eq_(self.render(t, x=Thing()), '0')
+        eq_(self.render(t, x=Thing()), '0')
+        eq_(self.render(t, x='thing'), '0')
+        eq_(self.render(t, x='thing:'), '1')
+
+    def test_position_and_language(self):
+        t = ('{% cache "k" %}{{ counter() }}{% endcache %}\n'
+             '{% cache "k" %}{{ counter() }}{% endcache %}')
+        eq_(self.render(t), '01')
+        with translation.override('xx'):
+            eq_(self.render(t), '23')
+
+    def test_escaping(self):
+        t = '{% cache "k" %}<b>{{ x }}</b>{% endcache %}'
+        eq_(self.render(t, x='<i>'), '<b>&lt;i&gt;</b>')
+        eq_(self.render(t, x='<i>'), '<b>&lt;i&gt;</b>')
+
+    @patch('jingo.ext.time.time')
+    def test_timeout(self, mock_time):
+        mock_time.return_value = 1000
+        t = '{% cache "k", timeout=10 %}{{ counter() }}{% endcache %}'
+        eq_(self.render(t), '0')
+        mock_time.return_value = 1009
+        eq_(self.render(t), '0')
+        mock_time.return_value = 1011
+        eq_(self.render(t), '1')
+
+    @patch('jingo.ext.time.time')
+    def test_stale_while_regenerating(self, mock_time):
+        mock_time.return_value = 1000
+        t = '{% cache "k", timeout=10 %}{{ counter() }}{% endcache %}'
+        eq_(self.render(t), '0')
+
+        # Someone else is regenerating the expired copy.
+        mock_time.return_value = 1011
+        with patch.object(caches['default'], 'add', return_value=False):
+            eq_(self.render(t), '0')
+        eq_(self.render(t), '1')
+
+    @patch('jingo.ext.time.time')
+    def test_lock_released_on_error(self, mock_time):
+        mock_time.return_value = 1000
+        t = '{% cache "k", timeout=10 %}{{ counter() }}{% endcache %}'
+        eq_(self.render(t), '0')
+
+        def boom():
+            raise ValueError
+
+        # The same tag and line, so the same key.
+        broken = '{% cache "k", timeout=10 %}{{ boom() }}{% endcache %}'
+        mock_time.return_value = 1011
+        assert_raises(ValueError, self.render, broken, boom=boom)
+        # Whoever comes next regenerates it.
+        eq_(self.render(t), '1')
+
+    def test_miss_leaves_lock_alone(self):
+        # Another worker is regenerating; a miss here didn't take its lock.
+        cache = caches['default']
+        t = '{% cache "k" %}{{ counter() }}{% endcache %}'
+        with patch.object(cache, 'delete') as delete:
+            eq_(self.render(t), '0')
+        assert not delete.called
+
+
+def test_urlparams_query_dict():
+    qd = QueryDict('a=1&a=2&c=3')
+    eq_(helpers.urlparams('/foo?a=0&b=1', query_dict=qd),
+        '/foo?a=1&a=2&b=1&c=3')
+    eq_(helpers.urlparams('/foo?a=0', query_dict=qd, a='x'), '/foo?a=x&c=3')
+
+
+def test_urlparams_full_url():
+    eq_(helpers.urlparams('https://example.com/p;x?q=a+b#f', page=2),
+        'https://example.com/p;x?q=a+b&page=2#f')
+    eq_(helpers.urlparams('//example.com/?', fragment='top'),
+        '//example.com/#top')
+    eq_(helpers.urlparams('/?a=%20b&c'), '/?a=+b&c=')
+
+
+def test_urlparams_cached():
+    helpers._split_url.cache_clear()
+    helpers.urlparams('/cached?a=1', b=2)
+    helpers.urlparams('/cached?a=1', b=3)
+    eq_(helpers._split_url.cache_info().hits, 1)
+    eq_(helpers._split_url.cache_info().misses, 1)
+
+
+def test_url_cached():
+    helpers.url.cache_clear()
+    with patch('jingo.ext.reverse', side_effect=helpers.reverse) as reverse:
+        for i in range(3):
+            eq_(render('{{ url("url-args", 1, "foo") }}'), '/url/1/foo/')
+            eq_(render('{{ url("url-kwargs", word="bar", num=1) }}'),
+                '/url/1/bar/')
+    eq_(reverse.call_count, 2)
+    eq_(helpers.url.cache_info().hits, 4)
+    eq_(helpers.url.cache_info().misses, 2)
+
+
+def test_url_cache_key():
+    helpers.url.cache_clear()
+    eq_(helpers.url('url-args', 1, 1), '/url/1/1/')
+    eq_(helpers.url('url-args', 1, True), '/url/1/True/')
+
+    # Unhashable arguments are just not cached.
+    with patch('jingo.ext.reverse', return_value='/list/'):
+        eq_(helpers.url('list', [1]), '/list/')
+    eq_(helpers.url.cache_info().misses, 2)
+
+    set_script_prefix('/prefix/')
+    try:
+        eq_(helpers.url('url-args', 1, 'foo'), '/prefix/url/1/foo/')
+    finally:
+        set_script_prefix('/')
+
+
+def test_url_cache_cleared_on_setting_changed():
+    helpers.url('url-args', 1, 'foo')
+    with override_settings(ROOT_URLCONF='jingo.tests.urls'):
+        eq_(helpers.url.cache_info().currsize, 0)
@@ -1,12 +1,15 @@
 from __future__ import unicode_literals
 
 from django.shortcuts import render
+from django.template.base import TemplateDoesNotExist
 
-from nose.tools import eq_
+from nose.tools import eq_, assert_raises
 try:
-    from unittest.mock import Mock
+    from unittest.mock import Mock, patch
 except ImportError:
-    from mock import Mock
+    from mock import Mock, patch
+
+import jingo
 
 
 def test_render():
@@ -37,3 +40,51 @@ def test_render_django_no_toplevel_override():
 def test_render_django_toplevel_override():
     r = render(Mock(), 'django_app/test_override.html', {})
     eq_(r.content, b'HELLO ...\n')
+
+
+def test_load_template_source():
+    loader = jingo.Loader()
+    source, filename = loader.load_template_source('jinja_app/test.html')
+    eq_(source, "{{ 'hello'.upper() }}\n")
+    assert filename.endswith('jinja_app/test.html')
+
+
+def test_load_template_source_cached():
+    loader = jingo.Loader()
+    env = jingo.get_env()
+    get_source = Mock(return_value=('source', 'filename', lambda: True))
+    with patch.object(env, 'loader', Mock(get_source=get_source)):
+        eq_(loader.load_template_source('a.html'), ('source', 'filename'))
+        eq_(loader.load_template_source('a.html'), ('source', 'filename'))
+    eq_(get_source.call_count, 1)
+
+
+def test_load_template_source_reloads():
+    loader = jingo.Loader()
+    env = jingo.get_env()
+    get_source = Mock(return_value=('old', 'filename', lambda: False))
+    with patch.object(env, 'loader', Mock(get_source=get_source)):
+        with patch.object(env, 'auto_reload', False):
+            loader.load_template_source('a.html')
+            get_source.return_value = ('new', 'filename', lambda: True)
+            eq_(loader.load_template_source('a.html'), ('old', 'filename'))
+        with patch.object(env, 'auto_reload', True):
+            eq_(loader.load_template_source('a.html'), ('new', 'filename'))
+            eq_(loader.load_template_source('a.html'), ('new', 'filename'))
+    eq_(get_source.call_count, 2)
+
+
+def test_load_template_source_excluded():
+    loader = jingo.Loader()
+    assert_raises(TemplateDoesNotExist, loader.load_template_source,
+                  'django_app/test.html')
+    assert_raises(TemplateDoesNotExist, loader.load_template_source,
+                  'jinja_app/nope.html')
+
+
+def test_valid_template_cached():
+    loader = jingo.Loader()
+    with patch.object(loader, '_check', return_value=True) as check:
+        assert loader._valid_template('jinja_app/test.html')
+        assert loader._valid_template('jinja_app/test.html')
+    eq_(check.call_count, 1)
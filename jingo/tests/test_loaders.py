@@ -0,0 +1,123 @@
+from __future__ import unicode_literals
+
+import os
+import shutil
+import tempfile
+
+from django.test.utils import override_settings
+import jinja2
+from nose.tools import eq_, assert_raises
+try:
+    from unittest.mock import patch
+except ImportError:
+    from mock import patch
+
+import jingo
+from jingo.loaders import IndexedLoader
+
+
+def setup():
+    global first, second
+    first, second = tempfile.mkdtemp(), tempfile.mkdtemp()
+    _write(first, 'a.html', 'first a')
+    _write(second, 'a.html', 'second a')
+    _write(second, 'sub/b.html', 'second b')
+
+
+def teardown():
+    shutil.rmtree(first)
+    shutil.rmtree(second)
+
+
+def _write(root, name, source):
+    path = os.path.join(root, *name.split('/'))
+    if not os.path.isdir(os.path.dirname(path)):
+        os.makedirs(os.path.dirname(path))
+    with open(path, 'w') as fp:
+        fp.write(source)
+
+
+def _render(loader, name):
+    return jinja2.Environment(loader=loader).get_template(name).render()
+
+
+def test_first_loader_wins():
+    loader = IndexedLoader([jinja2.FileSystemLoader(first),
+                            jinja2.FileSystemLoader(second)])
+    eq_(loader.list_templates(), ['a.html', 'sub/b.html'])
+    eq_(_render(loader, 'a.html'), 'first a')
+    eq_(_render(loader, 'sub/b.html'), 'second b')
+    eq_(_render(loader, './sub//b.html'), 'second b')
+
+
+def test_goes_straight_to_owner():
+    fs_first = jinja2.FileSystemLoader(first)
+    loader = IndexedLoader([fs_first, jinja2.FileSystemLoader(second)])
+    with patch.object(fs_first, 'get_source') as get_source:
+        eq_(_render(loader, 'sub/b.html'), 'second b')
+    assert not get_source.called
+
+
+def test_package_loader():
+    loader = IndexedLoader([jinja2.PackageLoader('jingo.tests.jinja_app'),
+                            jinja2.PackageLoader('jingo')])
+    eq_(_render(loader, 'jinja_app/test_nonoverride.html'), 'HELLO')
+
+
+def test_unlisted_loaders_asked_in_order():
+    overrides = jinja2.FunctionLoader(
+        lambda name: 'override' if name == 'a.html' else None)
+    loader = IndexedLoader([jinja2.FileSystemLoader(first), overrides,
+                            jinja2.FileSystemLoader(second)])
+    eq_(_render(loader, 'a.html'), 'first a')
+
+    loader = IndexedLoader([overrides, jinja2.FileSystemLoader(first)])
+    eq_(_render(loader, 'a.html'), 'override')
+
+
+def test_missing_templates_remembered():
+    fallback = jinja2.FunctionLoader(lambda name: None)
+    loader = IndexedLoader([fallback, jinja2.FileSystemLoader(first)])
+    env = jinja2.Environment(loader=loader)
+    with patch.object(fallback, 'get_source',
+                      side_effect=jinja2.TemplateNotFound('x')) as get_source:
+        assert_raises(jinja2.TemplateNotFound, env.get_template, 'x.html')
+        assert_raises(jinja2.TemplateNotFound, env.get_template, 'x.html')
+    eq_(get_source.call_count, 1)
+
+
+def test_auto_reload():
+    root = tempfile.mkdtemp()
+    try:
+        loader = IndexedLoader([jinja2.FileSystemLoader(root)],
+                               auto_reload=True, check_interval=0)
+        env = jinja2.Environment(loader=loader)
+        assert_raises(jinja2.TemplateNotFound, env.get_template,
+                      'new/c.html')
+
+        _write(root, 'new/c.html', 'new c')
+        eq_(env.get_template('new/c.html').render(), 'new c')
+    finally:
+        shutil.rmtree(root)
+
+
+def test_no_reload_by_default():
+    root = tempfile.mkdtemp()
+    try:
+        loader = IndexedLoader([jinja2.FileSystemLoader(root)])
+        _write(root, 'c.html', 'c')
+        assert_raises(jinja2.TemplateNotFound, _render, loader, 'c.html')
+    finally:
+        shutil.rmtree(root)
+
+
+def test_get_env_setting():
+    old_env = jingo._env
+    jingo._env = None
+    try:
+        with override_settings(JINGO_INDEX_TEMPLATES=True):
+            env = jingo.get_env()
+        assert isinstance(env.loader, IndexedLoader)
+        eq_(env.get_template('jinja_app/test.html').render(), 'HELLO')
+    finally:
+        jingo._env = old_env
@@ -0,0 +1,70 @@
+from __future__ import unicode_literals
+
+import jinja2
+from nose.tools import eq_
+
+from jingo.ext import JingoExtension
+from jingo.meta import readable_names
+
+
+def _template(name, **templates):
+    env = jinja2.Environment(loader=jinja2.DictLoader(templates),
+                             extensions=[JingoExtension])
+    env.filters['ctx'] = jinja2.contextfilter(lambda context, x: x)
+    return env.get_template(name)
+
+
+def test_names():
+    t = _template('a.html', **{
+        'a.html': ('{% extends "base.html" %}'
+                   '{% block content %}{{ a }}{% set b = 1 %}{{ b }}'
+                   '{% include "inc.html" %}{% endblock %}'),
+        'base.html': '{{ title }}{% block content %}{% endblock %}',
+        'inc.html': '{% import "macros.html" as m %}{{ m.x(inc) }}',
+        'macros.html': '{% macro x(y) %}{{ y }}{{ mac }}{% endmacro %}',
+    })
+    eq_(readable_names(t), set(['a', 'title', 'inc', 'mac']))
+
+
+def test_recursive():
+    t = _template('a.html', **{
+        'a.html': '{{ a }}{% include "b.html" %}',
+        'b.html': '{{ b }}{% include "a.html" %}',
+    })
+    eq_(readable_names(t), set(['a', 'b']))
+
+
+def test_unknown():
+    # Dynamic includes.
+    t = _template('a.html', **{'a.html': '{% include name %}'})
+    eq_(readable_names(t), None)
+
+    # Context functions and filters can read anything.
+    t = _template('a.html', **{'a.html': '{{ csrf() }}'})
+    eq_(readable_names(t), None)
+    t = _template('a.html', **{'a.html': '{{ "x"|ctx }}'})
+    eq_(readable_names(t), None)
+
+    # Missing templates and templates without a name.
+    t = _template('a.html', **{'a.html': '{% include "nope.html" %}'})
+    eq_(readable_names(t), None)
+    eq_(readable_names(jinja2.Template('{{ a }}')), None)
+
+
+def test_cached():
+    t = _template('a.html', **{'a.html': '{{ a }}'})
+    eq_(readable_names(t), set(['a']))
+    t.environment.loader.mapping['a.html'] = '{{ b }}'
+    eq_(readable_names(t), set(['a']))
+
+
+def test_cached_until_includes_change():
+    t = _template('a.html', **{'a.html': '{% include "b.html" %}',
+                               'b.html': '{{ b }}'})
+    eq_(readable_names(t), set(['b']))
+    t.environment.loader.mapping['b.html'] = '{{ c }}'
+    eq_(readable_names(t), set(['c']))
+
+    t.environment.auto_reload = False
+    t.environment.loader.mapping['b.html'] = '{{ d }}'
+    eq_(readable_names(t), set(['c']))
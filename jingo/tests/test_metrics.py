@@ -0,0 +1,132 @@
+from __future__ import unicode_literals
+
+import shutil
+import tempfile
+
+from django.core.management import call_command
+from django.test.utils import override_settings
+from django.utils.six import StringIO
+import jinja2
+from nose.tools import eq_
+try:
+    from unittest.mock import patch
+except ImportError:
+    from mock import patch
+
+import jingo
+from jingo import metrics
+
+
+def _env(**templates):
+    return jingo.Environment(loader=jinja2.DictLoader(templates))
+
+
+def _record(env, name, **context):
+    calls = []
+    with patch.object(metrics, 'listeners',
+                      [lambda *args: calls.append(args)]):
+        eq_(env.get_template(name).render(context), context.get('out', ''))
+    return calls
+
+
+def test_disabled_by_default():
+    env = _env(**{'a.html': 'a'})
+    eq_(_record(env, 'a.html', out='a'), [])
+
+
+@override_settings(JINGO_RENDER_METRICS=True)
+def test_nested_templates():
+    env = _env(**{
+        'a.html': ('{% extends "base.html" %}{% block content %}'
+                   '{% include "inc.html" %}{% endblock %}'),
+        'base.html': '<{% block content %}{% endblock %}>',
+        'inc.html': '{% import "macros.html" as m %}{{ m.x() }}',
+        'macros.html': '{% macro x() %}hi{% endmacro %}',
+    })
+    calls = _record(env, 'a.html', out='<hi>')
+    eq_([(name, size, parent) for name, _, _, size, parent in calls], [
+        ('macros.html', 0, 'inc.html'),
+        ('inc.html', 2, 'base.html'),
+        ('base.html', 4, 'a.html'),
+        ('a.html', 4, None),
+    ])
+    for name, elapsed, own, size, parent in calls:
+        assert 0 <= own <= elapsed, name
+
+
+@override_settings(JINGO_RENDER_METRICS=True)
+def test_listener_errors():
+    def broken(*args):
+        raise ValueError('broken')
+
+    env = _env(**{'a.html': 'a', 'b.html': '{{ x.y() }}'})
+    with patch.object(metrics, 'listeners', [broken]):
+        with patch.object(metrics, 'log') as log:
+            eq_(env.get_template('a.html').render(), 'a')
+            assert log.exception.called
+            # The template's own error comes out, not the listener's.
+            try:
+                env.get_template('b.html').render()
+            except jinja2.UndefinedError:
+                pass
+            else:
+                assert False, 'UndefinedError not raised'
+
+
+def test_flush_errors():
+    agg = metrics.Aggregator()
+    agg('a.html', 1.0, 0.5, 10, None)
+    with override_settings(JINGO_RENDER_METRICS_DIR='/nonexistent/jingo'):
+        with patch.object(metrics, 'log') as log:
+            agg.flush()
+    assert log.exception.called
+
+
+def test_aggregator():
+    agg = metrics.Aggregator()
+    agg('a.html', 0.5, 0.25, 10, None)
+    agg('a.html', 1.5, 0.75, 30, 'base.html')
+    s = agg.snapshot()['a.html']
+    eq_((s['count'], s['total'], s['own'], s['size']), (2, 2.0, 1.0, 40))
+    eq_(s['samples'], [0.5, 1.5])
+    eq_(s['parents'], {'base.html': 1})
+    agg.reset()
+    eq_(agg.snapshot(), {})
+
+
+def test_percentile():
+    samples = list(range(101))
+    eq_(metrics.percentile(samples, 50), 50)
+    eq_(metrics.percentile(samples, 99), 99)
+    eq_(metrics.percentile([], 50), 0.0)
+
+
+def test_flush_and_load():
+    directory = tempfile.mkdtemp()
+    try:
+        with override_settings(JINGO_RENDER_METRICS_DIR=directory):
+            for pid in (1, 2):
+                agg = metrics.Aggregator()
+                agg('a.html', 1.0, 0.5, 10, 'base.html')
+                with patch('os.getpid', lambda: pid):
+                    agg.flush()
+
+            merged = metrics.load(directory)
+            eq_(merged['a.html']['count'], 2)
+            eq_(merged['a.html']['samples'], [1.0, 1.0])
+            eq_(merged['a.html']['parents'], {'base.html': 2})
+
+            out = StringIO()
+            call_command('jingo_render_stats', stdout=out)
+            line = out.getvalue().splitlines()[1].split()
+            eq_(line, ['a.html', '2', '2000.0', '1000.0', '1000.0',
+                       '1000.0', '1000.0', '1000.0', '10', 'base.html'])
+    finally:
+        shutil.rmtree(directory)
+
+
+def test_command_without_renders():
+    out = StringIO()
+    with patch.object(metrics, 'aggregator', metrics.Aggregator()):
+        call_command('jingo_render_stats', stdout=out)
+    eq_(out.getvalue().strip(), 'No renders recorded.')
@@ -0,0 +1,98 @@
+from __future__ import unicode_literals
+
+from django.core.management import call_command
+from django.test.utils import override_settings
+from django.utils.six import StringIO
+import jinja2
+from nose.tools import eq_
+
+import jingo
+from jingo import minify
+
+
+def _env():
+    return jingo.get_env().overlay(extensions=[minify.MinifyExtension])
+
+
+def test_minify():
+    m = minify.Minifier()
+    eq_(m.minify('<div  class="a   b"\n   id=x>\n\n  <p>Don\'t   stop</p>\n'),
+        '<div class="a   b"\nid=x>\n<p>Don\'t stop</p>\n')
+    eq_(m.minify('<PRE>\n  a   b\n</pre>  <textarea>x  '),
+        '<PRE>\n  a   b\n</pre> <textarea>x  ')
+    # State carries over to the next piece of data.
+    eq_(m.minify('  y</textarea>\t<a href="'), '  y</textarea> <a href="')
+    eq_(m.minify(' \xa0 '), ' \xa0 ')
+    eq_(m.minify('  "  title=\'  \'>'), '  " title=\'  \'>')
+
+
+def test_render():
+    t = _env().from_string(
+        '<ul>\n'
+        '  {% for i in items %}\n'
+        '    <li title="{{ i }}  x">  {{ i }}  </li>\n'
+        '  {% endfor %}\n'
+        '</ul>\n'
+        '<script>\n  var x  = "{{ items|length }}";\n</script>\n'
+        '<pre>\n  {{ "a  b" }}\n  done\n</pre>\n')
+    eq_(t.render({'items': ['a  b', 'c']}),
+        # trim_blocks already took the newline after each block tag.
+        '<ul>\n'
+        ' <li title="a  b  x"> a  b </li>\n'
+        ' <li title="c  x"> c </li>\n'
+        '</ul>\n'
+        '<script>\n  var x  = "2";\n</script>\n'
+        '<pre>\n  a  b\n  done\n</pre>')
+
+
+def test_trans():
+    source = ('<p>\n  {% trans count=1, user="fred" %}\n'
+              '      Hello   {{ user }},\n      friend\n'
+              '  {% pluralize %}\n      Hello   all\n  {% endtrans %}\n</p>')
+    env = jinja2.Environment(extensions=['jinja2.ext.i18n',
+                                         minify.MinifyExtension])
+    # The messages babel extracts, without the extension.
+    plain = jinja2.Environment(extensions=['jinja2.ext.i18n'])
+    (_, _, message), = plain.extract_translations(source)
+    singular, plural = message[:2]
+    catalog = {singular: 'Hallo %(user)s', plural: 'Hallo allemaal'}
+    env.install_gettext_callables(
+        lambda s: catalog.get(s, s),
+        lambda s, p, n: catalog.get(s if n == 1 else p, s if n == 1 else p),
+        newstyle=False)
+    eq_(env.from_string(source).render(), '<p>\nHallo fred\n</p>')
+
+
+def test_saved():
+    env = _env()
+    env.cache.clear()
+    minify.saved.pop('a.html', None)
+    env.parse('<p>\n    x\n</p>', 'a.html')
+    eq_(minify.saved['a.html'], (14, 10))
+
+
+def test_setting():
+    with override_settings(JINGO_MINIFY_HTML=True):
+        env = jingo._build_env()
+    assert minify.MinifyExtension.identifier in env.extensions
+    assert (minify.MinifyExtension.identifier not in
+            jingo._build_env().extensions)
+
+
+def test_command():
+    out, err = StringIO(), StringIO()
+    excludes = jingo.EXCLUDE_APPS + ('django_app',)
+    with override_settings(JINGO_EXCLUDE_APPS=excludes):
+        call_command('jingo_minify', stdout=out, stderr=err)
+    assert 'jinja_app/test.html' in out.getvalue()
+    assert 'total' in out.getvalue()
+    eq_(err.getvalue(), '')
+
+
+def test_command_errors():
+    # The test settings leave the admin's Django templates to Jinja.
+    err = StringIO()
+    call_command('jingo_minify', stdout=StringIO(), stderr=err)
+    assert ("admin/base.html: Encountered unknown tag 'load'."
+            in err.getvalue())
+    assert 'jinja_app/' not in err.getvalue()
@@ -1,10 +1,15 @@
 from __future__ import unicode_literals
 
 from django import forms
+from django.forms.forms import BoundField
 from django.utils import six
 
 from jinja2 import escape
 from nose.tools import eq_
+try:
+    from unittest.mock import patch
+except ImportError:
+    from mock import patch
 
 import jingo.monkey
 
@@ -28,3 +33,43 @@ def test_monkey_patch():
 
     s = six.text_type(form['email'])
     eq_(s, render('{{ form.email }}', {'form': form}))
+
+
+def _counting(cls, name, calls):
+    original = getattr(cls, name)
+
+    def method(self, *args, **kwargs):
+        calls.append(name)
+        return original(self, *args, **kwargs)
+    return patch.object(cls, name, method)
+
+
+def test_monkey_patch_cache():
+    originals = forms.BaseForm.__html__, BoundField.__html__
+    jingo.monkey.patch(cache=True)
+    try:
+        calls = []
+        form = MyForm({'email': 'fred@example.com'})
+        with _counting(MyForm, 'as_table', calls):
+            eq_(render('{{ form }}{{ form }}', {'form': form}),
+                six.text_type(form) * 2)
+            eq_(len(calls), 2)  # Once for the template, once for us.
+
+            form.fields['email'].widget.attrs['class'] = 'wide'
+            assert 'wide' in render('{{ form }}', {'form': form})
+            form.add_error('email', 'Nope')
+            assert 'Nope' in render('{{ form }}', {'form': form})
+            eq_(len(calls), 4)
+
+        del calls[:]
+        with _counting(forms.EmailInput, 'render', calls):
+            t = '{{ form.email }}{{ form.email.errors }}{{ form.email }}'
+            html = render(t, {'form': form})
+            eq_(len(calls), 1)
+            assert 'Nope' in html
+
+            form.data = {'email': 'bob@example.com'}
+            assert 'bob@' in render('{{ form.email }}', {'form': form})
+            eq_(len(calls), 2)
+    finally:
+        forms.BaseForm.__html__, BoundField.__html__ = originals
@@ -0,0 +1,135 @@
+from __future__ import unicode_literals
+
+import os
+import shutil
+import tempfile
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test.utils import override_settings
+from django.utils.six import StringIO
+import jinja2
+from nose.tools import eq_, assert_raises
+
+import jingo
+from jingo.loaders import PrecompiledLoader
+from jingo.precompile import compile_templates, list_templates
+
+
+def setup():
+    global target
+    target = tempfile.mkdtemp()
+
+
+def teardown():
+    shutil.rmtree(target)
+
+
+def _precompiled_env(path):
+    loader = jinja2.ChoiceLoader([PrecompiledLoader(path),
+                                  jinja2.DictLoader({'b.html': 'B'})])
+    return jinja2.Environment(loader=loader)
+
+
+def test_list_templates_skips_unlistable_loaders():
+    loader = jinja2.ChoiceLoader([
+        PrecompiledLoader(target),
+        jinja2.PackageLoader('jingo'),  # No templates directory.
+        jinja2.DictLoader({'b.html': '', 'a.html': ''}),
+        jinja2.DictLoader({'a.html': ''}),
+    ])
+    eq_(list_templates(loader), ['a.html', 'b.html'])
+
+
+def _check_compile(path, zip, workers=1):
+    env = jinja2.Environment(loader=jinja2.DictLoader({
+        'a.html': '{{ "a"|upper }}',
+        'b.html': 'not compiled',
+    }))
+    compiled, errors = compile_templates(env, path, zip=zip,
+                                         filter_func=lambda n: n != 'b.html',
+                                         workers=workers)
+    eq_(compiled, ['a.html'])
+    eq_(errors, [])
+
+    env = _precompiled_env(path)
+    eq_(env.get_template('a.html').render(), 'A')
+    # Anything that wasn't compiled falls through to the source loaders.
+    eq_(env.get_template('b.html').render(), 'B')
+    eq_(env.loader.get_source(env, 'b.html')[0], 'B')
+
+
+def test_compile_directory():
+    _check_compile(os.path.join(target, 'dir'), None)
+
+
+def test_compile_zip():
+    _check_compile(os.path.join(target, 'templates.zip'), 'deflated')
+
+
+def test_compile_in_processes():
+    _check_compile(os.path.join(target, 'processes'), None, workers=2)
+
+
+def test_compile_errors():
+    env = jinja2.Environment(loader=jinja2.DictLoader({
+        'bad.html': '{% if %}',
+        'good.html': 'ok',
+        'worse.html': '{{ }',
+    }))
+    for workers in (1, 2):
+        compiled, errors = compile_templates(
+            env, os.path.join(target, 'errors'), workers=workers)
+        eq_(compiled, ['good.html'])
+        # Every error is collected, even from other processes.
+        eq_([(name, e.lineno) for name, e in errors],
+            [('bad.html', 1), ('worse.html', 1)])
+        assert all(isinstance(e, jinja2.TemplateSyntaxError)
+                   for _, e in errors)
+
+
+def test_compile_unreadable():
+    source = os.path.join(target, 'unreadable')
+    os.makedirs(source)
+    with open(os.path.join(source, 'latin1.html'), 'wb') as fp:
+        fp.write(b'caf\xe9')
+    with open(os.path.join(source, 'ok.html'), 'wb') as fp:
+        fp.write(b'ok')
+    env = jinja2.Environment(loader=jinja2.FileSystemLoader(source))
+    for workers in (1, 2):
+        compiled, errors = compile_templates(
+            env, os.path.join(target, 'unreadable-out'), workers=workers)
+        eq_(compiled, ['ok.html'])
+        eq_([name for name, _ in errors], ['latin1.html'])
+        assert isinstance(errors[0][1], UnicodeDecodeError)
+
+
+def test_command():
+    path = os.path.join(target, 'command')
+    out = StringIO()
+    exclude = jingo.EXCLUDE_APPS + ('django_app',)
+    with override_settings(JINGO_EXCLUDE_APPS=exclude):
+        call_command('jingo_compile', path, workers=2, stdout=out)
+    assert 'into %s' % path in out.getvalue()
+
+    # Excluded apps (like django_app here) are left to Django.
+    env = _precompiled_env(path)
+    eq_(env.get_template('jinja_app/test.html').render(), 'HELLO')
+    assert_raises(jinja2.TemplateNotFound, env.get_template,
+                  'django_app/test.html')
+
+
+def test_command_usage():
+    assert_raises(CommandError, call_command, 'jingo_compile')
+
+
+def test_get_env_loads_precompiled_first():
+    old_env = jingo._env
+    jingo._env = None
+    try:
+        with override_settings(JINGO_PRECOMPILED_TEMPLATES=target):
+            env = jingo.get_env()
+    finally:
+        jingo._env = old_env
+    assert isinstance(env.loader.loaders[0], PrecompiledLoader)
+    eq_(env.loader.loaders[0].module.__path__, [target])
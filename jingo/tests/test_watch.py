@@ -0,0 +1,123 @@
+from __future__ import unicode_literals
+
+import os
+import shutil
+import tempfile
+import time
+
+from django.test.utils import override_settings
+import jinja2
+from nose.tools import eq_
+try:
+    from unittest.mock import patch
+except ImportError:
+    from mock import patch
+
+import jingo
+from jingo.loaders import IndexedLoader
+from jingo.watch import TemplateWatcher, _Inotify
+
+
+def setup():
+    global directory
+    directory = tempfile.mkdtemp()
+
+
+def teardown():
+    shutil.rmtree(directory)
+
+
+def _write(name, source):
+    path = os.path.join(directory, name)
+    if not os.path.isdir(os.path.dirname(path)):
+        os.makedirs(os.path.dirname(path))
+    with open(path, 'w') as fp:
+        fp.write(source)
+
+
+def _wait_for(condition):
+    deadline = time.time() + 5
+    while not condition():
+        assert time.time() < deadline, 'Timed out waiting for the watcher.'
+        time.sleep(0.01)
+
+
+def _cached(env, name):
+    return any(key[1] == name for key in env.cache.keys())
+
+
+def test_watcher():
+    backends = ['poll']
+    try:
+        _Inotify([]).close()
+    except (AttributeError, OSError, TypeError):
+        pass
+    else:
+        backends.append('inotify')
+    for backend in backends:
+        yield _check_watcher, backend
+
+
+def _check_watcher(backend):
+    _write(backend + '/base.html', 'base 1 {% block b %}{% endblock %}')
+    _write(backend + '/child.html',
+           '{% extends "base.html" %}{% block b %}child{% endblock %}')
+    _write(backend + '/other.html', 'other')
+    env = jingo.Environment(
+        loader=jinja2.FileSystemLoader(os.path.join(directory, backend)))
+    watcher = TemplateWatcher([os.path.join(directory, backend)], backend,
+                              interval=0.01)
+    watcher.watch(env)
+    watcher.start()
+    try:
+        eq_(env.get_template('child.html').render(), 'base 1 child')
+        env.get_template('other.html')
+        eq_(watcher.dependents['base.html'], set(['child.html']))
+
+        # Cached templates don't touch the filesystem.
+        with patch('os.path.getmtime', side_effect=AssertionError):
+            with patch('os.stat', side_effect=AssertionError):
+                env.get_template('child.html')
+
+        generation = watcher.generation
+        if backend == 'poll':
+            time.sleep(0.02)  # So the mtime changes.
+        _write(backend + '/base.html', 'base 2 {% block b %}{% endblock %}')
+        _wait_for(lambda: not _cached(env, 'child.html'))
+        assert not _cached(env, 'base.html')
+        assert _cached(env, 'other.html')
+        assert watcher.generation > generation
+        eq_(env.get_template('child.html').render(), 'base 2 child')
+    finally:
+        watcher.stop()
+
+
+def test_new_templates_are_indexed():
+    _write('indexed/a.html', 'a')
+    root = os.path.join(directory, 'indexed')
+    env = jingo.Environment(loader=IndexedLoader(
+        [jinja2.FileSystemLoader(root)]))
+    watcher = TemplateWatcher([root], 'poll')
+    watcher.watch(env)
+    try:
+        env.get_template('b.html')
+    except jinja2.TemplateNotFound:
+        pass
+    _write('indexed/b.html', 'b')
+    watcher.changed([os.path.join(root, 'b.html')], structural=True)
+    eq_(env.get_template('b.html').render(), 'b')
+
+
+def test_settings():
+    with override_settings(DEBUG=True, JINGO_WATCH_TEMPLATES='poll',
+                           TEMPLATE_DIRS=[directory]):
+        env = jingo._build_env()
+    try:
+        assert not env.auto_reload
+        eq_(env.watcher.roots[0], os.path.abspath(directory))
+    finally:
+        env.watcher.stop()
+
+    with override_settings(DEBUG=False, JINGO_WATCH_TEMPLATES=True):
+        env = jingo._build_env()
+    eq_(env.watcher, None)
@@ -0,0 +1,21 @@
+from __future__ import unicode_literals
+
+from django.conf import settings
+from django.http import Http404, JsonResponse
+
+from jingo import get_env
+from jingo.cache import TemplateCache
+
+
+def template_cache_stats(request):
+    """This process's template cache stats, as JSON, for ``DEBUG`` or staff.
+
+    Add ``?memory`` to estimate the memory each template takes.
+    """
+    user = getattr(request, 'user', None)
+    if not (settings.DEBUG or getattr(user, 'is_staff', False)):
+        raise Http404
+    cache = get_env().cache
+    if not isinstance(cache, TemplateCache):
+        raise Http404
+    return JsonResponse(cache.stats(memory='memory' in request.GET))
@@ -0,0 +1,279 @@
+"""
+Watch template directories instead of checking templates as they're loaded.
+
+With ``auto_reload`` (on when ``DEBUG`` is), Jinja stats a template's file
+every time it's loaded, which adds up with lots of templates and includes.
+Set ``JINGO_WATCH_TEMPLATES`` to watch the template directories from a
+background thread instead.  It uses inotify on Linux, or rescans the
+directories every ``JINGO_WATCH_INTERVAL`` seconds (1 by default)
+elsewhere, or when set to ``'poll'``.  Changed templates, and every template
+that extends, includes or imports them, are evicted from the Environment's
+cache, so loading a template is just a cache lookup.
+"""
+
+from __future__ import unicode_literals
+
+import collections
+import ctypes
+import ctypes.util
+import errno
+import logging
+import os
+import select
+import struct
+import sys
+import threading
+import weakref
+
+from jingo.loaders import IndexedLoader
+
+log = logging.getLogger('jingo')
+
+
+class TemplateWatcher(object):
+    """Evict templates from Environments' caches when their files under
+    ``roots`` change.
+
+    ``backend`` is ``'inotify'``, ``'poll'`` or ``'auto'`` (inotify if it's
+    available).  ``generation`` goes up after every change, for anything else
+    holding on to templates or their source.
+    """
+
+    def __init__(self, roots, backend='auto', interval=1):
+        self.roots = [os.path.abspath(root) for root in roots]
+        self.backend = backend
+        self.interval = interval
+        self.environments = weakref.WeakSet()
+        # Template name -> the templates that extend, include or import it.
+        self.dependents = collections.defaultdict(set)
+        self.generation = 0
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def watch(self, environment):
+        """Evict changed templates from ``environment``'s cache, which then
+        doesn't need ``auto_reload``."""
+        self.environments.add(environment)
+        environment.watcher = self
+        environment.auto_reload = False
+
+    def depends(self, name, parent):
+        """Remember that the template ``parent`` loads ``name``."""
+        if parent is not None and parent not in self.dependents[name]:
+            with self._lock:
+                self.dependents[name].add(parent)
+
+    def start(self):
+        if self.backend in ('auto', 'inotify'):
+            try:
+                source = _Inotify(self.roots)
+            except (AttributeError, OSError, TypeError) as e:
+                if self.backend == 'inotify':
+                    raise
+                log.info('inotify is unavailable (%s), polling templates '
+                         'instead.', e)
+                source = _Poller(self.roots)
+        else:
+            source = _Poller(self.roots)
+        self._thread = threading.Thread(target=self._run, args=(source,),
+                                        name='jingo-template-watcher')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self, source):
+        try:
+            while not self._stopped.is_set():
+                try:
+                    paths, structural = source.changes(self.interval,
+                                                       self._stopped)
+                except Exception:
+                    log.exception('Watching templates failed.')
+                    self._stopped.wait(self.interval)
+                    continue
+                if paths or structural:
+                    self.changed(paths, structural)
+        finally:
+            source.close()
+
+    def names(self, paths):
+        """Return the template names ``paths`` would be loaded as."""
+        names = set()
+        for path in paths:
+            for root in self.roots:
+                if path.startswith(root + os.sep):
+                    names.add('/'.join(
+                        os.path.relpath(path, root).split(os.sep)))
+        return names
+
+    def changed(self, paths, structural=False):
+        """Evict the templates at ``paths``, and their dependents.
+
+        ``structural`` means files or directories came or went, so loaders
+        that index templates are refreshed, and with ``paths`` None, every
+        template is evicted.
+        """
+        environments = list(self.environments)
+        with self._lock:
+            cached = set()
+            for env in environments:
+                if env.cache is not None:
+                    cached.update(key[1] for key in env.cache.keys())
+            known = cached | set(self.dependents)
+            if paths is None:
+                stale = known
+            else:
+                # A path can be a directory that was moved or deleted.
+                changed = self.names(paths)
+                stale = set(n for n in known if n in changed or
+                            any(n.startswith(c + '/') for c in changed))
+            todo = list(stale)
+            while todo:
+                for parent in self.dependents.get(todo.pop(), ()):
+                    if parent not in stale:
+                        stale.add(parent)
+                        todo.append(parent)
+
+            for env in environments:
+                if structural and isinstance(env.loader, IndexedLoader):
+                    env.loader.refresh()
+                if env.cache is None:
+                    continue
+                for key in env.cache.keys():
+                    if key[1] in stale:
+                        try:
+                            del env.cache[key]
+                        except KeyError:
+                            pass
+            self.generation += 1
+        if stale:
+            log.debug('Reloading templates: %s', ', '.join(sorted(stale)))
+
+
+# From <sys/inotify.h>.
+_IN_MODIFY = 0x2
+_IN_ATTRIB = 0x4
+_IN_CLOSE_WRITE = 0x8
+_IN_MOVED_FROM = 0x40
+_IN_MOVED_TO = 0x80
+_IN_CREATE = 0x100
+_IN_DELETE = 0x200
+_IN_DELETE_SELF = 0x400
+_IN_MOVE_SELF = 0x800
+_IN_Q_OVERFLOW = 0x4000
+_IN_IGNORED = 0x8000
+_IN_ISDIR = 0x40000000
+_IN_STRUCTURAL = (_IN_MOVED_FROM | _IN_MOVED_TO | _IN_CREATE | _IN_DELETE |
+                  _IN_DELETE_SELF | _IN_MOVE_SELF)
+_IN_MASK = _IN_MODIFY | _IN_ATTRIB | _IN_CLOSE_WRITE | _IN_STRUCTURAL
+_event = struct.Struct(str('iIII'))
+
+
+class _Inotify(object):
+    """Template changes from Linux's inotify, with a watch on every
+    directory under ``roots``."""
+
+    def __init__(self, roots):
+        libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        self._add_watch = libc.inotify_add_watch
+        self._add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p,
+                                    ctypes.c_uint32]
+        self.fd = libc.inotify_init()
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init failed')
+        self.dirs = {}  # Watch descriptor -> directory.
+        for root in roots:
+            self.add(root)
+
+    def add(self, root):
+        for path, _, _ in os.walk(root, followlinks=True):
+            wd = self._add_watch(self.fd, _fs_encode(path), _IN_MASK)
+            if wd < 0:
+                err = ctypes.get_errno()
+                if err != errno.ENOENT:
+                    log.warning('Could not watch %s: %s', path,
+                                os.strerror(err))
+                continue
+            self.dirs[wd] = path
+
+    def changes(self, timeout, stopped):
+        if not select.select([self.fd], [], [], timeout)[0]:
+            return set(), False
+        data = os.read(self.fd, 64 * 1024)
+        paths, structural, pos = set(), False, 0
+        while pos < len(data):
+            wd, mask, _, size = _event.unpack_from(data, pos)
+            pos += _event.size
+            name = data[pos:pos + size].rstrip(b'\0')
+            pos += size
+            if mask & _IN_Q_OVERFLOW:
+                return None, True
+            if mask & _IN_IGNORED:
+                self.dirs.pop(wd, None)
+                continue
+            directory = self.dirs.get(wd)
+            if directory is None:
+                continue
+            path = os.path.join(directory, _fs_decode(name)) if name else \
+                directory
+            paths.add(path)
+            if mask & _IN_STRUCTURAL:
+                structural = True
+                if mask & _IN_ISDIR and mask & (_IN_CREATE | _IN_MOVED_TO):
+                    self.add(path)
+        return paths, structural
+
+    def close(self):
+        os.close(self.fd)
+
+
+class _Poller(object):
+    """Template changes found by comparing the files under ``roots`` with
+    what they were last time."""
+
+    def __init__(self, roots):
+        self.roots = roots
+        self.files = self.scan()
+
+    def scan(self):
+        files = {}
+        for root in self.roots:
+            for path, _, filenames in os.walk(root, followlinks=True):
+                for f in filenames:
+                    f = os.path.join(path, f)
+                    try:
+                        files[f] = os.stat(f).st_mtime
+                    except OSError:
+                        pass
+        return files
+
+    def changes(self, timeout, stopped):
+        if stopped.wait(timeout):
+            return set(), False
+        old, self.files = self.files, self.scan()
+        paths = set(f for f in self.files if self.files[f] != old.get(f))
+        gone = set(old) - set(self.files)
+        return paths | gone, bool(gone) or any(f not in old for f in paths)
+
+    def close(self):
+        pass
+
+
+def _fs_encode(path):
+    if isinstance(path, bytes):
+        return path
+    return path.encode(_fs_encoding())
+
+
+def _fs_decode(name):
+    return name.decode(_fs_encoding(), 'replace')
+
+
+def _fs_encoding():
+    return sys.getfilesystemencoding() or 'utf-8'
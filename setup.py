@@ -10,7 +10,7 @@ setup(
     author_email='me@jamessocol.com',
     url='http://github.com/jbalogh/jingo',
     license='BSD',
-    packages=['jingo'],
+    packages=['jingo', 'jingo.management', 'jingo.management.commands'],
     include_package_data=True,
     zip_safe=False,
     install_requires=['jinja2'],